@@ -1,10 +1,17 @@
-import os, asyncio, aiosqlite, datetime as dt
+import os, sys, time, json, hmac, hashlib, asyncio, aiosqlite, sqlite3, threading, traceback, collections, datetime as dt
+import concurrent.futures, cProfile, pstats, marshal, io
 from difflib import SequenceMatcher
+from urllib.parse import urlsplit, urlunsplit
+import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
 load_dotenv()
+try:
+    from PIL import Image   # optional: perceptual hashes for image proofs
+except ImportError:
+    Image = None
 
 # ======= MILESTONE ROLES =======
 ROLE_ONE_WEEK_WARRIOR = 1408191945628586004  # Day 7
@@ -33,19 +40,45 @@ MAX_HOURS           = 28                          # cooldown upper bound
 SIMILARITY_BLOCK    = 0.90                        # >= 0.90 similarity to last entry -> flag/reject
 
 LEADERBOARD_SIZE    = 10                          # top N on LB
+PARTNER_INVITE_HOURS = 24                         # pending partner invites expire after this
+REMINDER_LEAD_HOURS = 2                           # "window closing" DM this long before MAX_HOURS runs out
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+# single: one process does everything (default, `python Main.py`)
+# gateway: acks interactions, commits state, enqueues side effects (`python Main.py gateway`)
+# jobs: no gateway connection; consumes the job queue over REST (`python Main.py jobs`)
+BOT_MODE = "single"
+
+# Gateway intents. Everything arrives through slash commands, modals and raw
+# reactions, so message content stays off unless explicitly asked for.
+INTENT_MEMBERS         = os.getenv("INTENT_MEMBERS", "1") == "1"
+INTENT_MESSAGE_CONTENT = os.getenv("INTENT_MESSAGE_CONTENT", "0") == "1"
+# trimmed: cache only validators, milestone holders and recently active members, filled lazily
+# full: library default, every member chunked into memory at startup
+MEMBER_CACHE      = os.getenv("MEMBER_CACHE", "trimmed")
+MEMBER_RECENT_MAX = int(os.getenv("MEMBER_RECENT_MAX", "5000"))   # recently active members kept (LRU)
+
 INTENTS = discord.Intents.default()
-INTENTS.message_content = True
-INTENTS.members = True
+INTENTS.message_content = INTENT_MESSAGE_CONTENT
+INTENTS.members = INTENT_MEMBERS
 INTENTS.guilds = True
 INTENTS.reactions = True
 
-bot = commands.Bot(command_prefix="!", intents=INTENTS)
+class DedupTree(app_commands.CommandTree):
+    """Drops slash-command interactions that were already handled (see claim_event)."""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await claim_event(f"i:{interaction.id}", "interaction", durable=False)
+
+if MEMBER_CACHE == "trimmed":
+    bot = commands.Bot(command_prefix="!", intents=INTENTS, tree_cls=DedupTree,
+                       member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+else:
+    bot = commands.Bot(command_prefix="!", intents=INTENTS, tree_cls=DedupTree)
 tree = bot.tree
 
 DB_PATH = "/data/streaks.db"
+DB_TIMEOUT = 30.0   # seconds a connection waits on a locked database before "database is locked"
 LEADERBOARD_MESSAGE_ID = None   # populated after first run; bot will pin it
 TEST_GUILD = discord.Object(id=GUILD_ID)
 
@@ -56,7 +89,7 @@ CREATE TABLE IF NOT EXISTS users(
   user_id INTEGER PRIMARY KEY,
   current_streak INTEGER NOT NULL DEFAULT 0,
   longest_streak INTEGER NOT NULL DEFAULT 0,
-  last_checkin_at TEXT,
+  last_checkin_at INTEGER,               -- epoch seconds (UTC)
   frozen INTEGER NOT NULL DEFAULT 0
 );
 CREATE TABLE IF NOT EXISTS checkins(
@@ -64,36 +97,366 @@ CREATE TABLE IF NOT EXISTS checkins(
   user_id INTEGER NOT NULL,
   message_id INTEGER,
   channel_id INTEGER,
-  created_at TEXT NOT NULL,
+  created_at INTEGER NOT NULL,            -- epoch seconds (UTC)
   day_reported INTEGER,
   reflection TEXT NOT NULL,
   proof_url TEXT,
   status TEXT NOT NULL DEFAULT 'pending', -- pending|approved|rejected|expired
   validators TEXT DEFAULT '[]',
   similar_flag INTEGER NOT NULL DEFAULT 0,
-  reason TEXT
+  reason TEXT,
+  proof_flag INTEGER NOT NULL DEFAULT 0,  -- 1 = proof reused from own earlier check-in, 2 = from another member
+  assigned_to INTEGER,                    -- validator picked by ValidatorAssigner
+  escalated INTEGER NOT NULL DEFAULT 0,   -- 1 = ROLE_SENIOR_VALID pinged before expiry
+  quorum_at INTEGER                       -- when the approving quorum was reached
 );
+-- time-window queries are integer range scans on these
+CREATE INDEX IF NOT EXISTS idx_checkins_created ON checkins(created_at);
+CREATE INDEX IF NOT EXISTS idx_checkins_pending_age ON checkins(created_at) WHERE status='pending';
+CREATE INDEX IF NOT EXISTS idx_checkins_user ON checkins(user_id, status, created_at);
+-- pending load per validator (ValidatorAssigner.sync)
+CREATE INDEX IF NOT EXISTS idx_checkins_assigned ON checkins(assigned_to) WHERE status='pending';
+CREATE INDEX IF NOT EXISTS idx_users_last_checkin ON users(last_checkin_at);
+-- only live, unfrozen streaks can lapse; keeps the sweep from rescanning every old 0-streak
+CREATE INDEX IF NOT EXISTS idx_users_live_deadline ON users(last_checkin_at) WHERE current_streak>0 AND frozen=0;
 CREATE TABLE IF NOT EXISTS meta(
   key TEXT PRIMARY KEY,
   value TEXT
 );
 
+-- one row per link; the pair is stored canonically as (low_id, high_id)
 CREATE TABLE IF NOT EXISTS partners(
   id INTEGER PRIMARY KEY AUTOINCREMENT,
+  low_id       INTEGER NOT NULL,
+  high_id      INTEGER NOT NULL,
   requester_id INTEGER NOT NULL,
-  partner_id   INTEGER NOT NULL,
-  status       TEXT NOT NULL,           -- pending|active|declined|cancelled|unlinked
-  created_at   TEXT NOT NULL,
-  UNIQUE(requester_id),
-  UNIQUE(partner_id)
+  status       TEXT NOT NULL,           -- pending|active|declined|cancelled|unlinked|expired
+  created_at   INTEGER NOT NULL,        -- epoch seconds (UTC)
+  CHECK(low_id < high_id)
+);
+CREATE INDEX IF NOT EXISTS idx_partners_pair ON partners(low_id, high_id, status);
+CREATE INDEX IF NOT EXISTS idx_partners_pending_age ON partners(created_at) WHERE status='pending';
+
+-- per-user membership, mirrored from partners by triggers;
+-- the partial unique index allows at most one pending/active link per user
+CREATE TABLE IF NOT EXISTS partner_members(
+  user_id INTEGER NOT NULL,
+  link_id INTEGER NOT NULL,
+  status  TEXT NOT NULL,
+  PRIMARY KEY(user_id, link_id)
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_partner_members_open
+  ON partner_members(user_id) WHERE status IN ('pending','active');
+
+CREATE TRIGGER IF NOT EXISTS partners_members_ins AFTER INSERT ON partners BEGIN
+  INSERT INTO partner_members(user_id, link_id, status) VALUES(NEW.low_id, NEW.id, NEW.status);
+  INSERT INTO partner_members(user_id, link_id, status) VALUES(NEW.high_id, NEW.id, NEW.status);
+END;
+CREATE TRIGGER IF NOT EXISTS partners_members_upd AFTER UPDATE OF status ON partners BEGIN
+  UPDATE partner_members SET status=NEW.status WHERE link_id=NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS partners_members_del AFTER DELETE ON partners BEGIN
+  DELETE FROM partner_members WHERE link_id=OLD.id;
+END;
+
+-- leaderboard order (current, best, user_id) for /rank counts and keyset paging
+CREATE INDEX IF NOT EXISTS idx_users_rank
+  ON users(frozen, current_streak DESC, longest_streak DESC, user_id DESC);
+
+-- local durable job queue (gateway/worker split mode, see run_jobs)
+CREATE TABLE IF NOT EXISTS jobs(
+  id           INTEGER PRIMARY KEY AUTOINCREMENT,
+  kind         TEXT NOT NULL,
+  payload      TEXT NOT NULL,               -- JSON
+  status       TEXT NOT NULL DEFAULT 'queued', -- queued|running|done|failed
+  attempts     INTEGER NOT NULL DEFAULT 0,
+  available_at INTEGER NOT NULL,            -- epoch seconds; retries are pushed into the future
+  locked_by    TEXT,
+  locked_at    INTEGER,
+  created_at   INTEGER NOT NULL,
+  last_error   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(available_at, id) WHERE status='queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs(locked_at) WHERE status='running';
+
+-- opt-in check-in reminders; one row per subscribed user holding the next due
+-- reminder, re-anchored by triggers whenever users.last_checkin_at changes
+CREATE TABLE IF NOT EXISTS reminders(
+  user_id INTEGER PRIMARY KEY,
+  anchor  INTEGER,                -- last_checkin_at the schedule was computed from
+  stage   TEXT,                   -- next reminder to send: open|closing (NULL = nothing due)
+  next_at INTEGER                 -- epoch seconds when it is due
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_next ON reminders(next_at) WHERE next_at IS NOT NULL;
+
+-- content hashes of downloaded proofs; reuse is an index lookup at submission
+CREATE TABLE IF NOT EXISTS proofs(
+  id         INTEGER PRIMARY KEY AUTOINCREMENT,
+  checkin_id INTEGER NOT NULL,
+  user_id    INTEGER NOT NULL,
+  url        TEXT NOT NULL,             -- normalized (CDN signature params stripped)
+  sha256     BLOB NOT NULL,
+  phash      INTEGER,                   -- 64-bit dHash of images, NULL for other files
+  created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_proofs_sha ON proofs(sha256);
+CREATE INDEX IF NOT EXISTS idx_proofs_url ON proofs(url);
+-- phash split into four 16-bit bands: hashes within PROOF_PHASH_DISTANCE (<4) bits
+-- of each other share at least one band, so near-duplicates are point lookups too
+CREATE TABLE IF NOT EXISTS proof_bands(
+  band     INTEGER NOT NULL,            -- (band_no << 16) | 16-bit value
+  proof_id INTEGER NOT NULL,
+  PRIMARY KEY(band, proof_id)
+) WITHOUT ROWID;
+
+-- one bit per UTC day since CAL_EPOCH with an approved check-in (see cal_mark);
+-- dropped when an approved check-in changes status and rebuilt from rows on demand
+CREATE TABLE IF NOT EXISTS calendars(
+  user_id INTEGER PRIMARY KEY,
+  bits    BLOB NOT NULL                 -- little-endian bitset, bit i = CAL_EPOCH + i days
+);
+CREATE TRIGGER IF NOT EXISTS calendars_unapprove AFTER UPDATE OF status ON checkins
+  WHEN OLD.status='approved' AND NEW.status<>'approved' BEGIN
+  DELETE FROM calendars WHERE user_id=OLD.user_id;
+END;
+CREATE TRIGGER IF NOT EXISTS calendars_delete AFTER DELETE ON checkins WHEN OLD.status='approved' BEGIN
+  DELETE FROM calendars WHERE user_id=OLD.user_id;
+END;
+
+-- gateway events already handled (reaction = message+user, interaction = id); pruned by age
+CREATE TABLE IF NOT EXISTS processed_events(
+  key     TEXT PRIMARY KEY,
+  seen_at INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_processed_events_age ON processed_events(seen_at);
+
+-- first ✅ of each validator on a pending check-in: response times per validator
+CREATE TABLE IF NOT EXISTS validations(
+  checkin_id   INTEGER NOT NULL,
+  validator_id INTEGER NOT NULL,
+  reacted_at   INTEGER NOT NULL,
+  PRIMARY KEY(checkin_id, validator_id)
+) WITHOUT ROWID;
+
+-- O(1) stats: counters kept in sync by triggers (see rebuild_counters)
+-- keys: users | checkins:<status> | day:<YYYY-MM-DD> | partners:<status>
+CREATE TABLE IF NOT EXISTS counters(
+  name  TEXT PRIMARY KEY,
+  value INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS cnt_users_ins AFTER INSERT ON users BEGIN
+  INSERT INTO counters(name,value) VALUES('users', 1)
+    ON CONFLICT(name) DO UPDATE SET value=value+1;
+END;
+CREATE TRIGGER IF NOT EXISTS cnt_users_del AFTER DELETE ON users BEGIN
+  UPDATE counters SET value=value-1 WHERE name='users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS cnt_checkins_ins AFTER INSERT ON checkins BEGIN
+  INSERT INTO counters(name,value) VALUES('checkins:' || NEW.status, 1)
+    ON CONFLICT(name) DO UPDATE SET value=value+1;
+  INSERT INTO counters(name,value) VALUES('day:' || date(NEW.created_at, 'unixepoch'), 1)
+    ON CONFLICT(name) DO UPDATE SET value=value+1;
+END;
+CREATE TRIGGER IF NOT EXISTS cnt_checkins_upd AFTER UPDATE OF status ON checkins
+WHEN OLD.status IS NOT NEW.status BEGIN
+  UPDATE counters SET value=value-1 WHERE name='checkins:' || OLD.status;
+  INSERT INTO counters(name,value) VALUES('checkins:' || NEW.status, 1)
+    ON CONFLICT(name) DO UPDATE SET value=value+1;
+END;
+CREATE TRIGGER IF NOT EXISTS cnt_checkins_del AFTER DELETE ON checkins BEGIN
+  UPDATE counters SET value=value-1 WHERE name='checkins:' || OLD.status;
+  UPDATE counters SET value=value-1 WHERE name='day:' || date(OLD.created_at, 'unixepoch');
+END;
+
+CREATE TRIGGER IF NOT EXISTS cnt_partners_ins AFTER INSERT ON partners BEGIN
+  INSERT INTO counters(name,value) VALUES('partners:' || NEW.status, 1)
+    ON CONFLICT(name) DO UPDATE SET value=value+1;
+END;
+CREATE TRIGGER IF NOT EXISTS cnt_partners_upd AFTER UPDATE OF status ON partners
+WHEN OLD.status IS NOT NEW.status BEGIN
+  UPDATE counters SET value=value-1 WHERE name='partners:' || OLD.status;
+  INSERT INTO counters(name,value) VALUES('partners:' || NEW.status, 1)
+    ON CONFLICT(name) DO UPDATE SET value=value+1;
+END;
+CREATE TRIGGER IF NOT EXISTS cnt_partners_del AFTER DELETE ON partners BEGIN
+  UPDATE counters SET value=value-1 WHERE name='partners:' || OLD.status;
+END;
+
+"""
+
+# Full-text index over reflections (moderator search). Kept separate from CREATE_SQL
+# because FTS5 is a compile-time SQLite option; without it search is just disabled.
+FTS_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS checkins_fts USING fts5(
+  reflection, content='checkins', content_rowid='id', tokenize='porter unicode61'
 );
+CREATE TRIGGER IF NOT EXISTS checkins_fts_ins AFTER INSERT ON checkins BEGIN
+  INSERT INTO checkins_fts(rowid, reflection) VALUES(NEW.id, NEW.reflection);
+END;
+CREATE TRIGGER IF NOT EXISTS checkins_fts_del AFTER DELETE ON checkins BEGIN
+  INSERT INTO checkins_fts(checkins_fts, rowid, reflection) VALUES('delete', OLD.id, OLD.reflection);
+END;
+CREATE TRIGGER IF NOT EXISTS checkins_fts_upd AFTER UPDATE OF reflection ON checkins BEGIN
+  INSERT INTO checkins_fts(checkins_fts, rowid, reflection) VALUES('delete', OLD.id, OLD.reflection);
+  INSERT INTO checkins_fts(rowid, reflection) VALUES(NEW.id, NEW.reflection);
+END;
+"""
+FTS_ENABLED = False
+
+async def _init_fts(db):
+    global FTS_ENABLED
+    try:
+        await db.executescript(FTS_SQL)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ FTS5 unavailable, /admin search disabled: {e}")
+        FTS_ENABLED = False
+        return
+    FTS_ENABLED = True
+    row = await db_fetchone(db, "SELECT value FROM meta WHERE key='fts_seeded'")
+    if not row:
+        # index the reflections that existed before the FTS table did
+        await db.execute("INSERT INTO checkins_fts(checkins_fts) VALUES('rebuild')")
+        await db.execute("INSERT OR REPLACE INTO meta(key,value) VALUES('fts_seeded','1')")
+
+async def _migrate_partners_legacy(db) -> bool:
+    """Move a pre-pair-key partners table (requester_id/partner_id with UNIQUE
+    constraints) out of the way so CREATE_SQL can build the new one."""
+    cur = await db.execute("PRAGMA table_info(partners)")
+    cols = {r[1] for r in await cur.fetchall()}
+    if not cols or "low_id" in cols:
+        return False
+    for trg in ("cnt_partners_ins", "cnt_partners_upd", "cnt_partners_del"):
+        await db.execute(f"DROP TRIGGER IF EXISTS {trg}")
+    await db.execute("ALTER TABLE partners RENAME TO partners_legacy")
+    await db.commit()
+    return True
+
+async def _copy_partners_legacy(db):
+    cur = await db.execute("SELECT id, requester_id, partner_id, status, created_at FROM partners_legacy ORDER BY status='active' DESC, id DESC")
+    rows = await cur.fetchall()
+    for pid, req, other, status, created in rows:
+        if req == other:
+            continue
+        lo, hi = _pair(req, other)
+        try:
+            await db.execute("""
+              INSERT INTO partners(id, low_id, high_id, requester_id, status, created_at)
+              VALUES(?,?,?,?,?,?)""", (pid, lo, hi, req, status, iso_to_ts(created) or 0))
+        except sqlite3.IntegrityError:
+            # an active (or newer) link already claims one side; keep the row as history
+            await db.execute("""
+              INSERT INTO partners(id, low_id, high_id, requester_id, status, created_at)
+              VALUES(?,?,?,?, 'cancelled', ?)""", (pid, lo, hi, req, iso_to_ts(created) or 0))
+    await db.execute("DROP TABLE partners_legacy")
+
+# Timestamps used to be ISO-8601 TEXT; they are now INTEGER epoch seconds.
+# Changing a column's declared type needs a table rebuild, done in two phases:
+# rename the TEXT-era table to <table>_text, let CREATE_SQL build the new one,
+# then copy across converting with strftime('%s'). The copy is resumable.
+EPOCH_COPY_SQL = {
+    "checkins": """
+      INSERT OR IGNORE INTO checkins(id, user_id, message_id, channel_id, created_at, day_reported,
+                                     reflection, proof_url, status, validators, similar_flag, reason)
+      SELECT id, user_id, message_id, channel_id, COALESCE(CAST(strftime('%s', created_at) AS INTEGER), 0),
+             day_reported, reflection, proof_url, status, validators, similar_flag, reason
+      FROM checkins_text""",
+    "users": """
+      INSERT OR IGNORE INTO users(user_id, current_streak, longest_streak, last_checkin_at, frozen)
+      SELECT user_id, current_streak, longest_streak, CAST(strftime('%s', last_checkin_at) AS INTEGER), frozen
+      FROM users_text""",
+    "partners": """
+      INSERT OR IGNORE INTO partners(id, low_id, high_id, requester_id, status, created_at)
+      SELECT id, low_id, high_id, requester_id, status, COALESCE(CAST(strftime('%s', created_at) AS INTEGER), 0)
+      FROM partners_text""",
+}
+EPOCH_COLUMNS = {"checkins": "created_at", "users": "last_checkin_at", "partners": "created_at"}
+
+async def _migrate_epoch_rename(db):
+    for table, col in EPOCH_COLUMNS.items():
+        cur = await db.execute(f"PRAGMA table_info({table})")
+        if not any(r[1] == col and r[2].upper() == "TEXT" for r in await cur.fetchall()):
+            continue
+        # index/trigger names are global: drop them so CREATE_SQL recreates them on the new table
+        cur = await db.execute(
+            "SELECT type, name FROM sqlite_master WHERE tbl_name=? AND type IN ('index','trigger') AND sql IS NOT NULL",
+            (table,))
+        for typ, name in await cur.fetchall():
+            await db.execute(f"DROP {typ.upper()} IF EXISTS {name}")
+        await db.execute(f"ALTER TABLE {table} RENAME TO {table}_text")
+    await db.commit()
 
+async def _migrate_epoch_copy(db) -> bool:
+    copied = False
+    for table, sql in EPOCH_COPY_SQL.items():
+        if not await db_fetchone(db, "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", f"{table}_text"):
+            continue
+        if table == "partners":
+            # memberships are re-derived by the insert trigger for links not copied yet
+            await db.execute("DELETE FROM partner_members WHERE link_id NOT IN (SELECT id FROM partners)")
+        await db.execute(sql)
+        await db.execute(f"DROP TABLE {table}_text")
+        copied = True
+    if copied:
+        await db.execute("DELETE FROM meta WHERE key='fts_seeded'")   # FTS triggers were dropped with the old table
+        await rebuild_counters(db)
+    return copied
+
+def _reminder_trigger_sql() -> str:
+    body = f"""
+  UPDATE reminders SET anchor=NEW.last_checkin_at, stage='open', next_at=NEW.last_checkin_at + {MIN_HOURS * 3600}
+  WHERE user_id=NEW.user_id AND NEW.last_checkin_at IS NOT NULL;"""
+    return f"""
+DROP TRIGGER IF EXISTS reminders_anchor_ins;
+DROP TRIGGER IF EXISTS reminders_anchor_upd;
+CREATE TRIGGER reminders_anchor_ins AFTER INSERT ON users BEGIN{body}
+END;
+CREATE TRIGGER reminders_anchor_upd AFTER UPDATE OF last_checkin_at ON users BEGIN{body}
+END;
 """
 
-async def init_db():
-    async with aiosqlite.connect(DB_PATH) as db:
+async def _migrate_add_columns(db):
+    """Columns added after launch (CREATE TABLE IF NOT EXISTS won't add them)."""
+    cur = await db.execute("PRAGMA table_info(checkins)")
+    cols = {r[1] for r in await cur.fetchall()}
+    if "proof_flag" not in cols:
+        await db.execute("ALTER TABLE checkins ADD COLUMN proof_flag INTEGER NOT NULL DEFAULT 0")
+    if "assigned_to" not in cols:
+        await db.execute("ALTER TABLE checkins ADD COLUMN assigned_to INTEGER")
+        await db.execute("ALTER TABLE checkins ADD COLUMN escalated INTEGER NOT NULL DEFAULT 0")
+        await db.execute("ALTER TABLE checkins ADD COLUMN quorum_at INTEGER")
+
+_db_ready: str | None = None   # DB_PATH that init_db already prepared in this process
+
+async def init_db(force: bool = False):
+    """Create/migrate the schema. Cheap after the first call for a given DB_PATH."""
+    global _db_ready
+    if _db_ready == DB_PATH and not force:
+        return
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        migrated = await _migrate_partners_legacy(db)
+        await _migrate_epoch_rename(db)
+        if await db_fetchone(db, "SELECT 1 FROM sqlite_master WHERE type='table' AND name='checkins'"):
+            await _migrate_add_columns(db)
         await db.executescript(CREATE_SQL)
+        await db.executescript(_reminder_trigger_sql())
+        await _migrate_epoch_copy(db)
+        if migrated:
+            await _copy_partners_legacy(db)
+            await rebuild_counters(db)
+        # counters were added after launch: seed them once from the existing rows
+        row = await db_fetchone(db, "SELECT value FROM meta WHERE key='counters_seeded'")
+        if not row:
+            await rebuild_counters(db)
+            await db.execute("INSERT OR REPLACE INTO meta(key,value) VALUES('counters_seeded','1')")
+        await _init_fts(db)
+        row = await db_fetchone(db, "SELECT value FROM meta WHERE key='calendars_seeded'")
+        if not row:
+            await rebuild_calendars(db)
+            await db.execute("INSERT OR REPLACE INTO meta(key,value) VALUES('calendars_seeded','1')")
         await db.commit()
+    _db_ready = DB_PATH
 
 # 2) Helper: execute (uses an existing db connection)
 async def db_exec(db, query, *params):
@@ -107,10 +470,48 @@ async def db_fetchone(db, query, *params):
     await cur.close()
     return row
 
+# 4) Counters: trigger-maintained stats (constant-time reads)
+COUNTERS_REBUILD_SQL = """
+SELECT 'users', COUNT(*) FROM users
+UNION ALL
+SELECT 'checkins:' || status, COUNT(*) FROM checkins GROUP BY status
+UNION ALL
+SELECT 'day:' || date(created_at, 'unixepoch'), COUNT(*) FROM checkins GROUP BY date(created_at, 'unixepoch')
+UNION ALL
+SELECT 'partners:' || status, COUNT(*) FROM partners GROUP BY status
+"""
+
+async def get_counters(db, prefix: str = "") -> dict[str, int]:
+    """Read counters (optionally only those starting with prefix) as {name: value}."""
+    cur = await db.execute(
+        "SELECT name, value FROM counters WHERE name >= ? AND name < ?",
+        (prefix, prefix + "\uffff"))
+    rows = await cur.fetchall()
+    return {name: value for name, value in rows}
+
+async def get_counters_named(db, names: list[str]) -> dict[str, int]:
+    """Read just the named counters (primary-key lookups); missing ones are left out."""
+    cur = await db.execute(
+        f"SELECT name, value FROM counters WHERE name IN ({','.join('?' * len(names))})", names)
+    return {name: value for name, value in await cur.fetchall()}
+
+async def rebuild_counters(db) -> dict[str, tuple[int, int]]:
+    """Recompute every counter from the base tables (full scan).
+    Returns drift as {name: (stored, actual)} for counters that were wrong. Caller commits."""
+    stored = await get_counters(db)
+    cur = await db.execute(COUNTERS_REBUILD_SQL)
+    actual = {name: n for name, n in await cur.fetchall()}
+    drift = {k: (stored.get(k, 0), actual.get(k, 0))
+             for k in stored.keys() | actual.keys()
+             if stored.get(k, 0) != actual.get(k, 0)}
+    await db.execute("DELETE FROM counters")
+    await db.executemany("INSERT INTO counters(name,value) VALUES(?,?)", list(actual.items()))
+    return drift
+
 
 # ======= Utilities =======
 async def approve_checkin(checkin_id: int, validator_id: int, guild: discord.Guild):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         # fetch the checkin
         cur = await db.execute("SELECT user_id, created_at FROM checkins WHERE id=?", (checkin_id,))
         row = await cur.fetchone()
@@ -124,15 +525,15 @@ async def approve_checkin(checkin_id: int, validator_id: int, guild: discord.Gui
         # streak logic
         cur = await db.execute("SELECT last_checkin_at, streak_count FROM users WHERE user_id=?", (user_id,))
         row = await cur.fetchone()
-        last_iso, streak = row if row else (None, 0)
+        last_ts, streak = row if row else (None, 0)
 
-        hrs = hours_since(last_iso)
+        hrs = hours_since(last_ts)
         if hrs <= MAX_HOURS:  # continued streak
             streak += 1
         else:
             streak = 1  # reset streak
 
-        now = now_utc().isoformat()
+        now = now_ts()
         await db.execute("""
             INSERT INTO users(user_id, last_checkin_at, streak_count)
             VALUES(?,?,?)
@@ -144,20 +545,29 @@ async def approve_checkin(checkin_id: int, validator_id: int, guild: discord.Gui
 
     return user_id, streak
 
+# ======= Partners =======
+# Links are keyed by the canonical pair (low_id, high_id); partner_members gives
+# an indexed per-user lookup.
+def _pair(a_id: int, b_id: int) -> tuple[int, int]:
+    return (a_id, b_id) if a_id < b_id else (b_id, a_id)
+
+async def _open_link(db, user_id: int):
+    """(link_id, status, other_id, requester_id) of user_id's pending/active link, or None."""
+    cur = await db.execute("""
+      SELECT p.id, p.status,
+             CASE WHEN p.low_id=? THEN p.high_id ELSE p.low_id END AS other_id,
+             p.requester_id
+      FROM partner_members m JOIN partners p ON p.id = m.link_id
+      WHERE m.user_id=? AND m.status IN ('pending','active')
+    """, (user_id, user_id))
+    return await cur.fetchone()
+
 async def _has_open_partner(db, user_id: int) -> tuple[bool, str|None, int|None]:
     """Return (has_open, status, partner_id) for any pending/active link."""
-    cur = await db.execute("""
-      SELECT status,
-             CASE WHEN requester_id=? THEN partner_id ELSE requester_id END AS other_id
-      FROM partners
-      WHERE (requester_id=? OR partner_id=?)
-        AND status IN ('pending','active')
-      ORDER BY id DESC LIMIT 1
-    """, (user_id, user_id, user_id))
-    row = await cur.fetchone()
+    row = await _open_link(db, user_id)
     if not row:
         return (False, None, None)
-    return (True, row[0], row[1])
+    return (True, row[1], row[2])
 
 async def _create_partner_request(inter: discord.Interaction, target: discord.Member):
     if target.bot:
@@ -165,7 +575,7 @@ async def _create_partner_request(inter: discord.Interaction, target: discord.Me
     if target.id == inter.user.id:
         return "❌ You can’t partner with yourself."
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         # Check both sides for existing open link
         me_open, me_status, _ = await _has_open_partner(db, inter.user.id)
         if me_open:
@@ -174,134 +584,430 @@ async def _create_partner_request(inter: discord.Interaction, target: discord.Me
         if tg_open:
             return f"❌ {target.mention} already has a **{tg_status}** partner link."
 
-        now = now_utc().isoformat()
-        await db.execute("""
-          INSERT INTO partners(requester_id, partner_id, status, created_at)
-          VALUES(?,?, 'pending', ?)
-        """, (inter.user.id, target.id, now))
-        await db.commit()
+        lo, hi = _pair(inter.user.id, target.id)
+        now = now_ts()
+        try:
+            await db.execute("""
+              INSERT INTO partners(low_id, high_id, requester_id, status, created_at)
+              VALUES(?,?,?, 'pending', ?)
+            """, (lo, hi, inter.user.id, now))
+            await db.commit()
+        except sqlite3.IntegrityError:
+            # lost a race with another request: ux_partner_members_open said no
+            return "❌ One of you just got another partner link. Try `/partner status`."
     return None
 
-async def _set_partner_status(db, a_id: int, b_id: int, new_status: str):
-    await db.execute("""
+async def _set_partner_status(db, a_id: int, b_id: int, new_status: str) -> bool:
+    lo, hi = _pair(a_id, b_id)
+    cur = await db.execute("""
       UPDATE partners
       SET status=?
-      WHERE ((requester_id=? AND partner_id=?)
-         OR  (requester_id=? AND partner_id=?))
-        AND status='pending'
-    """, (new_status, a_id, b_id, b_id, a_id))
+      WHERE low_id=? AND high_id=? AND status='pending'
+    """, (new_status, lo, hi))
     await db.commit()
+    return cur.rowcount > 0
 
-async def _activate_partner(db, a_id: int, b_id: int):
-    await db.execute("""
-      UPDATE partners
-      SET status='active'
-      WHERE ((requester_id=? AND partner_id=?)
-         OR  (requester_id=? AND partner_id=?))
-        AND status='pending'
-    """, (a_id, b_id, b_id, a_id))
-    await db.commit()
+async def _activate_partner(db, a_id: int, b_id: int) -> bool:
+    return await _set_partner_status(db, a_id, b_id, 'active')
 
 async def _unlink_partner(inter: discord.Interaction):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("""
-          SELECT requester_id, partner_id, status
-          FROM partners
-          WHERE (requester_id=? OR partner_id=?)
-            AND status='active'
-          ORDER BY id DESC LIMIT 1
-        """, (inter.user.id, inter.user.id))
-        row = await cur.fetchone()
-        if not row:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        row = await _open_link(db, inter.user.id)
+        if not row or row[1] != 'active':
             return "❌ You don’t have an active partner."
-
-        a, b, _ = row
-        await db.execute("""
-          UPDATE partners SET status='unlinked'
-          WHERE ((requester_id=? AND partner_id=?)
-             OR  (requester_id=? AND partner_id=?))
-            AND status='active'
-        """, (a, b, b, a))
+        await db.execute("UPDATE partners SET status='unlinked' WHERE id=? AND status='active'", (row[0],))
         await db.commit()
     return None
 
 async def _cancel_pending(inter: discord.Interaction):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("""
-          SELECT id FROM partners
-          WHERE requester_id=? AND status='pending'
-          ORDER BY id DESC LIMIT 1
-        """, (inter.user.id,))
-        row = await cur.fetchone()
-        if not row:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        row = await _open_link(db, inter.user.id)
+        if not row or row[1] != 'pending' or row[3] != inter.user.id:
             return "❌ You don’t have a pending request you started."
-        await db.execute("UPDATE partners SET status='cancelled' WHERE id=?", (row[0],))
+        await db.execute("UPDATE partners SET status='cancelled' WHERE id=? AND status='pending'", (row[0],))
         await db.commit()
     return None
 
-class PartnerInviteView(discord.ui.View):
-    def __init__(self, requester_id: int, invitee_id: int, timeout: float = 86400):
-        super().__init__(timeout=timeout)  # 24h timeout
+class PartnerInviteButton(discord.ui.DynamicItem[discord.ui.Button],
+                          template=r"partner:(?P<action>accept|decline):(?P<req>[0-9]+):(?P<inv>[0-9]+)"):
+    """Stateless Accept/Decline button: requester and invitee live in the custom_id,
+    so invites keep working across restarts without a per-invite View in memory."""
+    def __init__(self, action: str, requester_id: int, invitee_id: int):
+        accept = action == "accept"
+        super().__init__(discord.ui.Button(
+            label="Accept" if accept else "Decline",
+            style=discord.ButtonStyle.success if accept else discord.ButtonStyle.danger,
+            custom_id=f"partner:{action}:{requester_id}:{invitee_id}",
+        ))
+        self.action = action
         self.requester_id = requester_id
         self.invitee_id = invitee_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], int(match["req"]), int(match["inv"]))
+
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if not await claim_event(f"i:{interaction.id}", "interaction", durable=False):
+            return False
         if interaction.user.id != self.invitee_id:
             await interaction.response.send_message("This invite isn’t for you.", ephemeral=True)
             return False
         return True
 
-    @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
-    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
-        async with aiosqlite.connect(DB_PATH) as db:
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "accept":
+            await self.accept(interaction)
+        else:
+            await self.decline(interaction)
+
+    async def _requester(self, guild: discord.Guild) -> discord.Member | None:
+        try:
+            return await get_member(guild, self.requester_id)
+        except discord.HTTPException:
+            return None   # left the server
+
+    async def accept(self, interaction: discord.Interaction):
+        async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
             # safety: ensure pending exists for this pair
-            await _activate_partner(db, self.requester_id, self.invitee_id)
+            ok = await _activate_partner(db, self.requester_id, self.invitee_id)
+        if not ok:
+            return await interaction.response.edit_message(content="⌛ This invite is no longer pending.", view=None)
 
-        req = interaction.guild.get_member(self.requester_id)
-        inv = interaction.guild.get_member(self.invitee_id)
+        inv = interaction.user
 
         await interaction.response.edit_message(
-            content=f"🤝 {inv.mention} **accepted** the partner invite from {req.mention}! You’re now accountability partners.",
+            content=f"🤝 {inv.mention} **accepted** the partner invite from <@{self.requester_id}>! You’re now accountability partners.",
             view=None
         )
+        req = await self._requester(interaction.guild)   # after the ack: may be a REST fetch
 
         # Optional: DM both
         try:
             if req: await req.send(f"✅ {inv.display_name} accepted your partner request!")
         except: pass
         try:
-            if inv: await inv.send(f"✅ You are now partners with {req.display_name}!")
+            await inv.send(f"✅ You are now partners with {req.display_name if req else f'<@{self.requester_id}>'}!")
         except: pass
 
-    @discord.ui.button(label="Decline", style=discord.ButtonStyle.danger)
-    async def decline(self, interaction: discord.Interaction, button: discord.ui.Button):
-        async with aiosqlite.connect(DB_PATH) as db:
-            await _set_partner_status(db, self.requester_id, self.invitee_id, 'declined')
+    async def decline(self, interaction: discord.Interaction):
+        async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+            ok = await _set_partner_status(db, self.requester_id, self.invitee_id, 'declined')
+        if not ok:
+            return await interaction.response.edit_message(content="⌛ This invite is no longer pending.", view=None)
 
-        req = interaction.guild.get_member(self.requester_id)
-        inv = interaction.guild.get_member(self.invitee_id)
+        inv = interaction.user
 
         await interaction.response.edit_message(
-            content=f"❌ {inv.mention} **declined** the partner invite from {req.mention}.",
+            content=f"❌ {inv.mention} **declined** the partner invite from <@{self.requester_id}>.",
             view=None
         )
+        req = await self._requester(interaction.guild)
 
         try:
             if req: await req.send(f"❌ Your partner request to {inv.display_name} was declined.")
         except: pass
 
+bot.add_dynamic_items(PartnerInviteButton)
+
+def partner_invite_view(requester_id: int, invitee_id: int) -> discord.ui.View:
+    """Components for an invite message. The view is stopped before sending so
+    discord.py doesn't keep it in its view store; clicks are routed through the
+    registered PartnerInviteButton instead."""
+    view = discord.ui.View(timeout=None)
+    view.add_item(PartnerInviteButton("accept", requester_id, invitee_id))
+    view.add_item(PartnerInviteButton("decline", requester_id, invitee_id))
+    view.stop()
+    return view
+
+async def expire_partner_invites(db) -> int:
+    """Expire pending invites older than PARTNER_INVITE_HOURS in one statement. Caller commits."""
+    cutoff = now_ts() - PARTNER_INVITE_HOURS * 3600
+    cur = await db.execute(
+        "UPDATE partners SET status='expired' WHERE status='pending' AND created_at<?", (cutoff,))
+    return cur.rowcount
+
+
+# ======= Clock =======
+class Clock:
+    """Wall clock. Reading the time and waiting for a point in time go through the
+    module-level `clock`, so sim.py can swap in a virtual one."""
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        """Wait for `event` at most `timeout` seconds; True if it was set."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return event.is_set()
+
+clock = Clock()
 
 def now_utc():
-    return dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+    return dt.datetime.fromtimestamp(clock.time(), dt.timezone.utc)
+
+def now_ts() -> int:
+    """Current time as epoch seconds — the format every stored timestamp uses."""
+    return int(clock.time())
 
-def hours_since(ts_iso: str|None):
-    if not ts_iso: return 10**6
+def hours_since(ts: int|None):
+    if ts is None: return 10**6
+    return (now_ts() - ts)/3600.0
+
+def iso_to_ts(ts_iso: str|None) -> int|None:
+    """Parse a legacy ISO-8601 timestamp (naive = UTC) to epoch seconds."""
+    if not ts_iso: return None
     t = dt.datetime.fromisoformat(ts_iso)
-    return (now_utc() - t).total_seconds()/3600.0
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=dt.timezone.utc)
+    return int(t.timestamp())
+
+def day_to_ts(day: dt.date) -> int:
+    """Epoch seconds at 00:00 UTC of `day`."""
+    return int(dt.datetime(day.year, day.month, day.day, tzinfo=dt.timezone.utc).timestamp())
+
+def fmt_ts(ts: int|None, style: str = "f") -> str:
+    """Discord timestamp markup (renders in the viewer's timezone)."""
+    return f"<t:{ts}:{style}>" if ts is not None else "never"
 
 def sim(a,b):
     return SequenceMatcher(a=a.strip(), b=b.strip()).ratio()
 
+# ======= Event recorder (opt-in traffic capture for replay.py) =======
+RECORD_PATH = os.getenv("RECORD_EVENTS")            # JSONL file; unset = recording off
+_record_salt = os.getenv("RECORD_SALT", os.urandom(16).hex()).encode()
+_record_file = None
+
+def _anon(snowflake: int | None) -> int | None:
+    """Stable pseudonym for a Discord id (keyed hash, not reversible without the salt)."""
+    if snowflake is None:
+        return None
+    d = hmac.new(_record_salt, str(snowflake).encode(), hashlib.sha256).digest()
+    return int.from_bytes(d[:7], "big")
+
+def _member_flags(member) -> list[str]:
+    roles = {r.id for r in getattr(member, "roles", [])}
+    flags = [name for name, rid in (("validator", ROLE_VALIDATOR), ("senior", ROLE_SENIOR_VALID)) if rid in roles]
+    if getattr(member, "bot", False):
+        flags.append("bot")
+    return flags
+
+def record_event(kind: str, **fields):
+    """Append one anonymized event (ids already passed through _anon) when RECORD_EVENTS is set."""
+    global _record_file
+    if not RECORD_PATH:
+        return
+    if _record_file is None:
+        _record_file = open(RECORD_PATH, "a", buffering=1, encoding="utf-8")
+    _record_file.write(json.dumps({"t": clock.time(), "kind": kind, **fields}) + "\n")
+
+# ======= Event-loop health: CPU offload + lag watchdog =======
+CPU_EXECUTOR = os.getenv("CPU_EXECUTOR", "thread")   # thread | process | inline
+CPU_WORKERS  = int(os.getenv("CPU_WORKERS", "2"))
+LAG_INTERVAL = 0.1                                    # seconds between loop-lag probes
+LAG_STALL_MS = int(os.getenv("LAG_STALL_MS", "250"))  # blocked this long -> log a stack sample
+
+_cpu_pool: concurrent.futures.Executor | None = None
+
+def _get_cpu_pool():
+    global _cpu_pool
+    if _cpu_pool is None and CPU_EXECUTOR != "inline":
+        if CPU_EXECUTOR == "process":
+            _cpu_pool = concurrent.futures.ProcessPoolExecutor(max_workers=CPU_WORKERS)
+        else:
+            _cpu_pool = concurrent.futures.ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+    return _cpu_pool
+
+async def run_cpu(fn, *args):
+    """Run a CPU-bound helper off the event loop (fn/args must be picklable for 'process')."""
+    pool = _get_cpu_pool()
+    if pool is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+class LoopWatchdog:
+    """Measures event-loop scheduling delay with a periodic probe task, and uses a
+    side thread to catch the loop blocked > stall_ms and sample its stack."""
+    def __init__(self, interval: float = LAG_INTERVAL, stall_ms: int = LAG_STALL_MS, keep: int = 4096):
+        self.interval = interval
+        self.stall_ms = stall_ms
+        self.samples: collections.deque[float] = collections.deque(maxlen=keep)   # lag in ms
+        self.stalls: collections.deque[tuple[str, float, str]] = collections.deque(maxlen=20)
+        self._beat = time.monotonic()
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        if self._task and not self._task.done():
+            return
+        self._loop_thread = threading.get_ident()
+        self._task = loop.create_task(self._probe())
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    async def _probe(self):
+        while True:
+            t0 = time.monotonic()
+            self._beat = t0
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            self.samples.append(max(0.0, (now - t0 - self.interval) * 1000))
+
+    def _watch(self):
+        reported = None
+        while True:
+            time.sleep(self.stall_ms / 2000)
+            beat = self._beat
+            blocked_ms = (time.monotonic() - beat - self.interval) * 1000
+            if blocked_ms < self.stall_ms or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)[-8:]) if frame else "<no frame>"
+            self.stalls.append((now_utc().isoformat(timespec="seconds"), blocked_ms, stack))
+            print(f"⚠️ event loop blocked >{blocked_ms:.0f}ms, stack sample:\n{stack}", flush=True)
+
+    def percentiles(self) -> dict[str, float]:
+        data = sorted(self.samples)
+        if not data:
+            return {}
+        pick = lambda q: data[min(len(data) - 1, int(q * len(data)))]
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": data[-1], "n": len(data)}
+
+watchdog = LoopWatchdog()
+
+# ======= Idempotent event processing =======
+# After a RESUME the gateway can replay events, and a validator can remove and re-add
+# a reaction. claim_event() lets each (message, user) reaction and each interaction
+# through once: an in-memory LRU answers the hot case, the processed_events table
+# covers restarts and other processes. Interactions skip the table (durable=False):
+# the claim sits before the 3 s acknowledgement, and a copy redelivered after a
+# restart could not be answered anyway.
+EVENT_LRU_SIZE     = 20000
+EVENT_LEDGER_HOURS = 48       # ledger rows older than this are pruned
+
+_seen_events: collections.OrderedDict[str, None] = collections.OrderedDict()
+duplicate_events = collections.Counter()   # "<kind>:<memory|ledger>" -> suppressed count
+
+def _remember_event(key: str):
+    _seen_events[key] = None
+    _seen_events.move_to_end(key)
+    if len(_seen_events) > EVENT_LRU_SIZE:
+        _seen_events.popitem(last=False)
+
+async def claim_event(key: str, kind: str, durable: bool = True) -> bool:
+    """True the first time `key` is seen; False (and counted) for duplicates."""
+    if key in _seen_events:
+        _seen_events.move_to_end(key)
+        duplicate_events[f"{kind}:memory"] += 1
+        return False
+    _remember_event(key)   # before the await, so a concurrent duplicate is caught in memory
+    if not durable:
+        return True
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        cur = await db.execute("INSERT OR IGNORE INTO processed_events(key, seen_at) VALUES(?,?)", (key, now_ts()))
+        await db.commit()
+    if cur.rowcount == 0:
+        duplicate_events[f"{kind}:ledger"] += 1
+        return False
+    return True
+
+async def release_event(key: str):
+    """Forget a claim whose handler failed, so a redelivery gets another try."""
+    _seen_events.pop(key, None)
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        await db.execute("DELETE FROM processed_events WHERE key=?", (key,))
+        await db.commit()
+
+async def prune_event_ledger(db) -> int:
+    """Caller commits."""
+    cur = await db.execute("DELETE FROM processed_events WHERE seen_at<?", (now_ts() - EVENT_LEDGER_HOURS * 3600,))
+    return cur.rowcount
+
+# ======= Member cache policy =======
+# With MEMBER_CACHE=trimmed the library caches nobody on its own; MemberCachePolicy
+# decides who stays in guild._members (the only way to cache a member by hand).
+# Role holders are pinned; everyone else who reacts or checks in goes through an LRU.
+# Cached members still receive GUILD_MEMBER_UPDATE, so their roles stay current.
+class MemberCachePolicy:
+    def __init__(self, recent_max: int = MEMBER_RECENT_MAX):
+        self.recent_max = recent_max
+        self.recent: collections.OrderedDict[int, None] = collections.OrderedDict()
+        self.warmed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return MEMBER_CACHE == "trimmed"
+
+    @staticmethod
+    def pinned(member: discord.Member) -> bool:
+        keep = _all_milestone_role_ids() | {ROLE_VALIDATOR, ROLE_SENIOR_VALID}
+        return any(r.id in keep for r in member.roles)
+
+    def touch(self, guild: discord.Guild, member: discord.Member | None):
+        """Record activity and keep `member` cached (pinned, or in the recent LRU)."""
+        if not self.enabled or member is None or not isinstance(member, discord.Member):
+            return
+        if isinstance(guild, RestGuild):
+            return   # the jobs process reads members from REST only; there is nothing to evict through
+        if guild.get_member(member.id) is None:
+            guild._add_member(member)
+        if self.pinned(member):
+            self.recent.pop(member.id, None)
+            return
+        self.recent[member.id] = None
+        self.recent.move_to_end(member.id)
+        while len(self.recent) > self.recent_max:
+            uid, _ = self.recent.popitem(last=False)
+            self._evict(guild, uid)
+
+    def _evict(self, guild: discord.Guild, uid: int):
+        m = guild.get_member(uid)
+        if m is not None and not self.pinned(m) and m != guild.me:
+            guild._remove_member(m)
+
+    def updated(self, before: discord.Member, after: discord.Member):
+        """A cached member's roles changed: unpinned members fall back to the LRU rules."""
+        if self.enabled and self.pinned(before) and not self.pinned(after):
+            self.recent[after.id] = None
+            while len(self.recent) > self.recent_max:
+                uid, _ = self.recent.popitem(last=False)
+                self._evict(after.guild, uid)
+
+    async def warm(self, guild: discord.Guild):
+        """Lazy chunking: page through the member list over REST in the background and
+        keep only role holders, instead of a full gateway chunk at startup."""
+        if not self.enabled or not INTENT_MEMBERS:
+            return
+        async for m in guild.fetch_members(limit=None):
+            if self.pinned(m) and guild.get_member(m.id) is None:
+                guild._add_member(m)
+                self.warmed += 1
+        print(f"✅ Member cache warmed: {self.warmed} role holder(s), {len(guild.members)} cached")
+
+member_cache = MemberCachePolicy()
+_warm_task: asyncio.Task | None = None
+
+async def get_member(guild: discord.Guild, user_id: int) -> discord.Member:
+    """Cached member, else fetched over REST (and cached per MemberCachePolicy)."""
+    m = guild.get_member(user_id)
+    if m is None:
+        m = await guild.fetch_member(user_id)
+        member_cache.touch(guild, m)
+    return m
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    member_cache.updated(before, after)
+
 def is_validator(member: discord.Member) -> bool:
     return any(r.id in (ROLE_VALIDATOR, ROLE_SENIOR_VALID) for r in member.roles)
 
@@ -312,7 +1018,7 @@ async def ensure_leaderboard_message(guild):
     # Make sure schema exists
     await init_db()
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         # Try to read existing message id
         row = await db_fetchone(db, "SELECT value FROM meta WHERE key='lb_msg_id'")
         channel = guild.get_channel(CHANNEL_LEADERBOARD)
@@ -338,32 +1044,316 @@ async def update_leaderboard(guild: discord.Guild):
     chan = guild.get_channel(CHANNEL_LEADERBOARD)
     if not chan: return
     msg = await ensure_leaderboard_message(guild)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         cur = await db.execute("""
             SELECT user_id, current_streak, longest_streak, frozen
             FROM users
             WHERE frozen=0
-            ORDER BY current_streak DESC, longest_streak DESC
+            ORDER BY current_streak DESC, longest_streak DESC, user_id DESC
             LIMIT ?""", (LEADERBOARD_SIZE,))
         rows = await cur.fetchall()
+    text = await run_cpu(_render_leaderboard, rows)
+    try:
+        await msg.edit(content=text)
+    except:
+        await chan.send(text)
+
+def _render_leaderboard(rows) -> str:
     lines = ["**🏆 Validated Streak Leaderboard**"]
     if not rows:
         lines.append("_No validated streaks yet._")
     else:
         for i,(uid,st,longest,frozen) in enumerate(rows, start=1):
             lines.append(f"{i}. <@{uid}> — **{st}** days (best: {longest})")
-    text = "\n".join(lines)
-    try:
-        await msg.edit(content=text)
-    except:
-        await chan.send(text)
+    return "\n".join(lines)
+
+# ======= Ranking (served by idx_users_rank) =======
+# Rank order is (current_streak, longest_streak, user_id) all DESC, so a row-value
+# comparison against a member's key is a single index range.
+async def _lb_page(db, after: tuple[int, int, int] | None, limit: int):
+    """Next `limit` non-frozen rows strictly after keyset cursor `after` (None = top)."""
+    if after is None:
+        cur = await db.execute("""
+            SELECT user_id, current_streak, longest_streak FROM users
+            WHERE frozen=0
+            ORDER BY current_streak DESC, longest_streak DESC, user_id DESC
+            LIMIT ?""", (limit,))
+    else:
+        cur = await db.execute("""
+            SELECT user_id, current_streak, longest_streak FROM users
+            WHERE frozen=0 AND (current_streak, longest_streak, user_id) < (?,?,?)
+            ORDER BY current_streak DESC, longest_streak DESC, user_id DESC
+            LIMIT ?""", (*after, limit))
+    return await cur.fetchall()
+
+async def get_rank(db, user_id: int):
+    """Return (rank, total, current, longest, ahead) or None if not ranked (no row / frozen).
+    `ahead` is (user_id, current_streak) of the member one place above, or None at #1."""
+    row = await db_fetchone(db,
+        "SELECT current_streak, longest_streak, frozen FROM users WHERE user_id=?", user_id)
+    if not row or row[2]:
+        return None
+    cs, ls, _ = row
+    key = (cs, ls, user_id)
+    better = (await db_fetchone(db, """
+        SELECT COUNT(*) FROM users
+        WHERE frozen=0 AND (current_streak, longest_streak, user_id) > (?,?,?)""", *key))[0]
+    total = (await db_fetchone(db, "SELECT COUNT(*) FROM users WHERE frozen=0"))[0]
+    ahead = await db_fetchone(db, """
+        SELECT user_id, current_streak FROM users
+        WHERE frozen=0 AND (current_streak, longest_streak, user_id) > (?,?,?)
+        ORDER BY current_streak, longest_streak, user_id
+        LIMIT 1""", *key)
+    return better + 1, total, cs, ls, ahead
+
+class LeaderboardView(discord.ui.View):
+    """Prev/Next browser over the full leaderboard using keyset cursors."""
+    def __init__(self, page_size: int = LEADERBOARD_SIZE, timeout: float = 300):
+        super().__init__(timeout=timeout)
+        self.page_size = page_size
+        self.cursors: list[tuple | None] = [None]   # cursor that starts each visited page
+        self.rows = []
+        self.has_next = False
+
+    @property
+    def page(self) -> int:
+        return len(self.cursors) - 1
+
+    async def load(self):
+        async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+            rows = await _lb_page(db, self.cursors[-1], self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        self.prev_btn.disabled = self.page == 0
+        self.next_btn.disabled = not self.has_next
+
+    def embed(self) -> discord.Embed:
+        start = self.page * self.page_size
+        desc = "\n".join(
+            f"**{start+i+1}.** <@{uid}> — 🔥 {st} days (best: {longest})"
+            for i, (uid, st, longest) in enumerate(self.rows)
+        ) or "_No validated streaks yet._"
+        e = discord.Embed(title="🏆 Leaderboard", description=desc, color=discord.Color.gold())
+        e.set_footer(text=f"Page {self.page + 1}")
+        return e
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.page > 0:
+            self.cursors.pop()
+        await self.load()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.has_next and self.rows:
+            uid, st, longest = self.rows[-1]
+            self.cursors.append((st, longest, uid))
+        await self.load()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
 
 async def post_log(guild: discord.Guild, content: str):
     chan = guild.get_channel(CHANNEL_LOGS)
     if chan:
         await chan.send(content)
 
-# ======= Modal =======
+# ======= Proof hashing =======
+# Proof links are downloaded once (through a bounded on-disk cache), hashed with
+# SHA-256 and, for images, a 64-bit dHash; the proofs table answers "seen before?"
+# with index lookups at submission time. Only Discord CDN links are fetched (members
+# type these URLs, so anything else could point the bot at internal addresses).
+PROOF_HASHING        = os.getenv("PROOF_HASHING", "1") == "1"
+PROOF_CACHE_DIR      = os.getenv("PROOF_CACHE_DIR", "/data/proof_cache")
+PROOF_CACHE_MAX_MB   = 200
+PROOF_MAX_BYTES      = 10 * 1024 * 1024
+PROOF_FETCH_TIMEOUT  = 8.0
+PROOF_PHASH_DISTANCE = 3       # max differing bits for "same picture" (must stay < 4 for the band lookup)
+_CDN_HOSTS = {"cdn.discordapp.com", "media.discordapp.net"}
+PROOF_FETCH_HOSTS = set(_CDN_HOSTS)   # hosts proofs may be downloaded from
+
+def proof_fetchable(url: str) -> bool:
+    parts = urlsplit(url.strip())
+    return parts.scheme in ("http", "https") and parts.hostname in PROOF_FETCH_HOSTS
+
+def normalize_proof_url(url: str) -> str:
+    """Discord CDN links carry expiring signature params; the file is the path.
+    Used as the cache/dedup key only — downloads need the signed URL."""
+    parts = urlsplit(url.strip())
+    if parts.hostname in _CDN_HOSTS:
+        parts = parts._replace(query="", fragment="")
+    return urlunsplit(parts)
+
+def _dhash(img) -> int:
+    small = img.convert("L").resize((9, 8), Image.LANCZOS)
+    px = list(small.getdata())
+    h = 0
+    for row in range(8):
+        for col in range(8):
+            h = (h << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return h
+
+def _hash_proof(data: bytes) -> tuple[bytes, int | None]:
+    """(sha256, dHash or None). Top-level so it can run in the CPU pool."""
+    digest = hashlib.sha256(data).digest()
+    if Image is None:
+        return digest, None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return digest, _dhash(img)
+    except Exception:
+        return digest, None   # not an image
+
+def _to_i64(h: int) -> int:
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+def _bands(h: int) -> list[int]:
+    h &= (1 << 64) - 1
+    return [(i << 16) | ((h >> (16 * i)) & 0xFFFF) for i in range(4)]
+
+class ProofCache:
+    """Bounded on-disk download cache keyed by normalized URL (the signed URL is what
+    gets fetched); evicts least recently used files once over max_bytes. Concurrent
+    requests for one file share a download."""
+    def __init__(self, root: str = PROOF_CACHE_DIR, max_bytes: int = PROOF_CACHE_MAX_MB * 1024 * 1024):
+        self.root, self.max_bytes = root, max_bytes
+        self.size: int | None = None
+        self.stats = collections.Counter()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._session: aiohttp.ClientSession | None = None
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.root, key[:2], key)
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        out = []
+        for dirpath, _, files in os.walk(self.root):
+            for f in files:
+                p = os.path.join(dirpath, f)
+                st = os.stat(p)
+                out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def _store(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".part", "wb") as f:
+            f.write(data)
+        os.replace(path + ".part", path)
+        if self.size is None:
+            self.size = sum(sz for _, sz, _ in self._scan())
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            for _, sz, p in sorted(self._scan()):
+                if self.size <= self.max_bytes * 0.9:
+                    break
+                os.remove(p)
+                self.size -= sz
+                self.stats["evicted"] += 1
+
+    def _load(self, path: str) -> bytes | None:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)   # LRU by mtime
+            return data
+        except FileNotFoundError:
+            return None
+
+    async def _download(self, url: str) -> bytes:
+        if not proof_fetchable(url):
+            raise ValueError(f"not fetching proofs from {urlsplit(url).hostname!r}")
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=PROOF_FETCH_TIMEOUT))
+        # no redirects: they could lead off the allowed hosts
+        async with self._session.get(url, allow_redirects=False) as resp:
+            resp.raise_for_status()
+            if resp.status != 200:
+                raise ValueError(f"unexpected HTTP {resp.status}")
+            if (resp.content_length or 0) > PROOF_MAX_BYTES:
+                raise ValueError("proof file too large")
+            data = bytearray()
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                data += chunk
+                if len(data) > PROOF_MAX_BYTES:
+                    raise ValueError("proof file too large")
+        self.stats["fetched"] += 1
+        return bytes(data)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def get(self, url: str) -> bytes:
+        key = normalize_proof_url(url)
+        path = self._path(key)
+        data = await asyncio.to_thread(self._load, path)
+        if data is not None:
+            self.stats["hit"] += 1
+            return data
+        if key in self._inflight:
+            self.stats["shared"] += 1
+            return await self._inflight[key]
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            data = await self._download(url)
+            await asyncio.to_thread(self._store, path, data)
+            fut.set_result(data)
+            return data
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()   # waiters re-raise it; don't warn about it being unretrieved
+            raise
+        finally:
+            del self._inflight[key]
+
+proof_cache = ProofCache()
+
+async def hash_proof(db, url: str) -> tuple[bytes, int | None]:
+    """Hashes for a proof URL as submitted: from the proofs table if its normalized
+    form was seen before (no download), else downloaded through proof_cache."""
+    row = await db_fetchone(db, "SELECT sha256, phash FROM proofs WHERE url=? LIMIT 1", normalize_proof_url(url))
+    if row:
+        proof_cache.stats["known_url"] += 1
+        return row[0], row[1]
+    data = await proof_cache.get(url)
+    return await run_cpu(_hash_proof, data)
+
+async def find_proof_reuse(db, user_id: int, sha: bytes, phash: int | None) -> tuple[int, int, int] | None:
+    """Earliest earlier proof with the same bytes or a near-identical image:
+    (flag, user_id, checkin_id) with flag 1 = own, 2 = another member's."""
+    cur = await db.execute("SELECT user_id, checkin_id FROM proofs WHERE sha256=? ORDER BY id LIMIT 1", (sha,))
+    hit = await cur.fetchone()
+    if hit is None and phash is not None:
+        bands = _bands(phash)
+        cur = await db.execute(f"""
+            SELECT DISTINCT p.phash, p.user_id, p.checkin_id, p.id FROM proof_bands b JOIN proofs p ON p.id=b.proof_id
+            WHERE b.band IN ({",".join("?" * len(bands))}) ORDER BY p.id""", bands)
+        for other, uid, cid, _ in await cur.fetchall():
+            if bin((other ^ phash) & ((1 << 64) - 1)).count("1") <= PROOF_PHASH_DISTANCE:
+                hit = (uid, cid)
+                break
+    if hit is None:
+        return None
+    return (1 if hit[0] == user_id else 2), hit[0], hit[1]
+
+async def record_proof(db, checkin_id: int, user_id: int, url: str, sha: bytes, phash: int | None):
+    """Index a submitted proof. Caller commits."""
+    cur = await db.execute("""INSERT INTO proofs(checkin_id, user_id, url, sha256, phash, created_at)
+                              VALUES(?,?,?,?,?,?)""",
+                           (checkin_id, user_id, url, sha, None if phash is None else _to_i64(phash), now_ts()))
+    if phash is not None:
+        await db.executemany("INSERT OR IGNORE INTO proof_bands(band, proof_id) VALUES(?,?)",
+                             [(b, cur.lastrowid) for b in _bands(phash)])
+
+def proof_flag_text(flag: int, other_uid: int | None, other_chk: int | None) -> str:
+    if flag == 1:
+        return f" (⚠️ proof reused from own check-in #{other_chk})"
+    if flag == 2:
+        return f" (⚠️ proof matches <@{other_uid}>'s check-in #{other_chk})"
+    return ""
+
 class CheckinModal(discord.ui.Modal, title="Daily Check-in"):
     day = discord.ui.TextInput(label="Day number (e.g., 7)", required=True, max_length=6)
     reflection = discord.ui.TextInput(
@@ -379,10 +1369,16 @@ class CheckinModal(discord.ui.Modal, title="Daily Check-in"):
         super().__init__()
         self.member = member
 
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await claim_event(f"i:{interaction.id}", "interaction", durable=False)
+
     async def on_submit(self, interaction: discord.Interaction):
+        record_event("checkin_submit", user=_anon(self.member.id), day=str(self.day.value)[:6],
+                     reflection_len=len(self.reflection.value), proof=bool(self.proof.value))
         await interaction.response.defer(ephemeral=True, thinking=True)
         guild = interaction.guild
         user = self.member
+        member_cache.touch(guild, user)
         # basic validation
         try:
             day_num = int(str(self.day.value).strip().replace("Day","").strip())
@@ -394,16 +1390,16 @@ class CheckinModal(discord.ui.Modal, title="Daily Check-in"):
         if len(self.reflection.value.strip()) < MIN_REF_CHARS:
             return await interaction.followup.send(f"❌ Reflection must be at least {MIN_REF_CHARS} characters.", ephemeral=True)
 
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.executescript(CREATE_SQL)
+        await init_db()
+        async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
             # cooldown
             cur = await db.execute("SELECT last_checkin_at FROM users WHERE user_id=?", (user.id,))
             row = await cur.fetchone()
-            last_iso = row[0] if row else None
-            hrs = hours_since(last_iso)
+            last_ts = row[0] if row else None
+            hrs = hours_since(last_ts)
             if hrs < MIN_HOURS:
                 return await interaction.followup.send(f"⏳ Too soon. Wait {MIN_HOURS-hrs:.1f} more hours.", ephemeral=True)
-            if hrs > MAX_HOURS and last_iso is not None:
+            if hrs > MAX_HOURS and last_ts is not None:
                 # late: will still allow, but mark as late (could expire w/o quorum)
                 pass
 
@@ -412,18 +1408,33 @@ class CheckinModal(discord.ui.Modal, title="Daily Check-in"):
             prev = await cur.fetchone()
             similar = 0
             if prev and prev[0]:
-                if sim(prev[0], self.reflection.value) >= SIMILARITY_BLOCK:
+                if await run_cpu(sim, prev[0], self.reflection.value) >= SIMILARITY_BLOCK:
                     similar = 1
 
+            # proof reuse check (same file, or the same picture re-encoded)
+            proof_url = (self.proof.value or "").strip()
+            proof_hash, proof_flag, reuse, proof_err = None, 0, None, None
+            if proof_url and PROOF_HASHING and proof_fetchable(proof_url):
+                try:
+                    proof_hash = await hash_proof(db, proof_url)
+                    reuse = await find_proof_reuse(db, user.id, *proof_hash)
+                except Exception as e:
+                    proof_err = f"{type(e).__name__}: {e}"
+                if reuse:
+                    proof_flag = reuse[0]
+
             # create pending record
-            now = now_utc().isoformat()
+            now = now_ts()
+            assignee = await assigner.pick(db, guild, user.id)
             await db.execute("""
-              INSERT INTO checkins(user_id, created_at, day_reported, reflection, proof_url, status, similar_flag)
-              VALUES(?,?,?,?,?, 'pending', ?)""",
-              (user.id, now, day_num, self.reflection.value.strip(), (self.proof.value or "").strip(), similar))
-            await db.commit()
+              INSERT INTO checkins(user_id, created_at, day_reported, reflection, proof_url, status, similar_flag, proof_flag, assigned_to)
+              VALUES(?,?,?,?,?, 'pending', ?, ?, ?)""",
+              (user.id, now, day_num, self.reflection.value.strip(), proof_url, similar, proof_flag, assignee))
             cur = await db.execute("SELECT last_insert_rowid()")
             chk_id = (await cur.fetchone())[0]
+            if proof_hash:
+                await record_proof(db, chk_id, user.id, normalize_proof_url(proof_url), *proof_hash)
+            await db.commit()
 
         
 
@@ -434,58 +1445,81 @@ class CheckinModal(discord.ui.Modal, title="Daily Check-in"):
                               color=discord.Color.orange())
         if self.proof.value:
             embed.add_field(name="Proof", value=self.proof.value[:300], inline=False)
+        proof_txt = proof_flag_text(*reuse) if reuse else ""
+        if proof_txt:
+            embed.add_field(name="Proof check", value=proof_txt.strip(" ()"), inline=False)
+        if assignee:
+            embed.add_field(name="Assigned", value=f"<@{assignee}>", inline=True)
         embed.set_footer(text=f"ID: {chk_id} • React ✅ (Validators) to validate")
-        msg = await chan.send(content=user.mention, embed=embed)
+        content = user.mention + (f" · assigned to <@{assignee}>" if assignee else "")
+        msg = await chan.send(content=content, embed=embed)
+        record_event("checkin_posted", user=_anon(user.id), message=_anon(msg.id))
         await msg.add_reaction("✅")
 
         # store message id
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
             await db.execute("UPDATE checkins SET message_id=?, channel_id=? WHERE id=?", (msg.id, chan.id, chk_id))
             await db.commit()
 
-        flag_txt = " (⚠️ similar to last entry)" if similar else ""
+        flag_txt = (" (⚠️ similar to last entry)" if similar else "") + proof_txt
         await interaction.followup.send(f"✅ Submitted! Your check-in is pending validator approval.{flag_txt}", ephemeral=True)
         await post_log(guild, f"📝 New check-in pending: <@{user.id}> Day {day_num}{flag_txt} (id {chk_id})")
+        if proof_err:
+            await post_log(guild, f"⚠️ Could not check the proof on #{chk_id} for reuse ({proof_err[:200]})")
 
 # ======= Slash Commands =======
 @tree.command(name="checkin", description="Submit your daily check-in")
 # @app_commands.guilds(TEST_GUILD)  # for testing; remove in production
 async def checkin_cmd(interaction: discord.Interaction):
+    record_event("checkin_cmd", user=_anon(interaction.user.id))
     await interaction.response.send_modal(CheckinModal(interaction.user))
 
-@tree.command(name="leaderboard", description="Show top streaks")
+@tree.command(name="leaderboard", description="Browse the streak leaderboard")
 async def leaderboard_cmd(interaction: discord.Interaction):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("""
-            SELECT user_id, streak_count 
-            FROM users 
-            ORDER BY streak_count DESC 
-            LIMIT 10
-        """)
-        rows = await cur.fetchall()
-
-    if not rows:
+    view = LeaderboardView()
+    await view.load()
+    if not view.rows:
         return await interaction.response.send_message("No check-ins yet.", ephemeral=True)
+    await interaction.response.send_message(embed=view.embed(), view=view)
 
-    desc = "\n".join(
-        f"**{i+1}.** <@{uid}> — 🔥 {streak} days"
-        for i, (uid, streak) in enumerate(rows)
+@tree.command(name="rank", description="See where you (or someone) stand on the leaderboard")
+async def rank_cmd(interaction: discord.Interaction, user: discord.Member|None=None):
+    user = user or interaction.user
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        info = await get_rank(db, user.id)
+    if not info:
+        return await interaction.response.send_message(f"{user.mention} is not ranked (no streak yet or frozen).", ephemeral=True)
+    rank, total, st, longest, ahead = info
+    pct = 100.0 * (total - rank) / total if total > 1 else 100.0
+    if ahead:
+        gap = ahead[1] - st
+        nxt = f"**{gap}** day(s) behind <@{ahead[0]}> (#{rank-1})" if gap else f"tied on streak with <@{ahead[0]}> (#{rank-1}) — best streak breaks ties"
+    else:
+        nxt = "👑 top of the board"
+    await interaction.response.send_message(
+        f"**{user.display_name}** — rank **#{rank}** of {total} (ahead of {pct:.1f}%)\n"
+        f"Current: **{st}**, best: **{longest}** • {nxt}",
+        ephemeral=True
     )
-    embed = discord.Embed(title="🏆 Leaderboard", description=desc, color=discord.Color.gold())
-    await interaction.response.send_message(embed=embed)
 
 @tree.command(name="dbinfo", description="Show quick DB stats")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def dbinfo(inter: discord.Interaction):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cu1 = await db.execute("SELECT COUNT(*) FROM users")
-        n_users = (await cu1.fetchone())[0]
-        cu2 = await db.execute("SELECT COUNT(*) FROM checkins WHERE status='pending'")
-        n_pending = (await cu2.fetchone())[0]
-        cu3 = await db.execute("SELECT COUNT(*) FROM checkins WHERE status='approved'")
-        n_approved = (await cu3.fetchone())[0]
+    # single read of the trigger-maintained counters (no table scans)
+    today = now_utc().date()
+    week = [(today - dt.timedelta(days=i)).isoformat() for i in range(7)]
+    names = (["users", "partners:active", "partners:pending"]
+             + [f"checkins:{s}" for s in ("pending", "approved", "rejected", "expired")]
+             + [f"day:{d}" for d in week])
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        c = await get_counters_named(db, names)
+    n_today = c.get(f"day:{week[0]}", 0)
+    n_week = sum(c.get(f"day:{d}", 0) for d in week)
+    statuses = ", ".join(f"**{c.get(f'checkins:{s}', 0)} {s}**" for s in ("pending", "approved", "rejected", "expired"))
     await inter.response.send_message(
-        f"**DB:** `{DB_PATH}`\nUsers: **{n_users}**\nCheckins: **{n_pending} pending**, **{n_approved} approved**",
+        f"**DB:** `{DB_PATH}`\nUsers: **{c.get('users', 0)}**\nCheckins: {statuses}\n"
+        f"Submitted: **{n_today}** today, **{n_week}** last 7 days\n"
+        f"Partners: **{c.get('partners:active', 0)} active**, **{c.get('partners:pending', 0)} pending**",
         ephemeral=True
     )
 
@@ -494,14 +1528,14 @@ async def dbinfo(inter: discord.Interaction):
 # @app_commands.guilds(TEST_GUILD)  # for testing; remove in production
 async def streak_view(interaction: discord.Interaction, user: discord.Member|None=None):
     user = user or interaction.user
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         cur = await db.execute("SELECT current_streak, longest_streak, last_checkin_at, frozen FROM users WHERE user_id=?", (user.id,))
         row = await cur.fetchone()
     if not row:
         return await interaction.response.send_message(f"{user.mention} has no streak yet.", ephemeral=True)
     st, longest, last, frozen = row
     fr = " (❄️ frozen)" if frozen else ""
-    when = f" • last check-in: {last}" if last else ""
+    when = f" • last check-in: {fmt_ts(last, 'R')}" if last is not None else ""
     await interaction.response.send_message(f"**{user.display_name}** — current: **{st}**, best: **{longest}**{fr}{when}", ephemeral=True)
 
 # --- Admin group ---
@@ -510,22 +1544,25 @@ admin = app_commands.Group(name="admin", description="Admin streak controls")
 @admin.command(name="set")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def admin_set(inter: discord.Interaction, user: discord.Member, value: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         await db.execute("""
             INSERT INTO users(user_id,current_streak,longest_streak,last_checkin_at)
             VALUES(?,?,?,?)
             ON CONFLICT(user_id) DO UPDATE SET current_streak=excluded.current_streak,
                                               longest_streak=MAX(users.longest_streak, excluded.current_streak)
-        """, (user.id, value, value, now_utc().isoformat()))
+        """, (user.id, value, value, now_ts()))
+        if BOT_MODE == "gateway":
+            await enqueue_job(db, "leaderboard", {})   # rendered by the jobs process
         await db.commit()
-    await update_leaderboard(inter.guild)
+    if BOT_MODE != "gateway":
+        await update_leaderboard(inter.guild)
     await inter.response.send_message(f"Set {user.mention} streak to {value}.", ephemeral=True)
     await post_log(inter.guild, f"🛠️ Admin set {user.mention} to {value} by {inter.user.mention}")
 
 @admin.command(name="add")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def admin_add(inter: discord.Interaction, user: discord.Member, delta: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         cur = await db.execute("SELECT current_streak,longest_streak FROM users WHERE user_id=?", (user.id,))
         row = await cur.fetchone()
         st = row[0] if row else 0
@@ -538,40 +1575,49 @@ async def admin_add(inter: discord.Interaction, user: discord.Member, delta: int
             ON CONFLICT(user_id) DO UPDATE SET current_streak=?,
                                               longest_streak=?,
                                               last_checkin_at=?
-        """, (user.id, st, longest, now_utc().isoformat(), st, longest, now_utc().isoformat()))
+        """, (user.id, st, longest, now_ts(), st, longest, now_ts()))
+        if BOT_MODE == "gateway":
+            await enqueue_job(db, "leaderboard", {})   # rendered by the jobs process
         await db.commit()
-    await update_leaderboard(inter.guild)
+    if BOT_MODE != "gateway":
+        await update_leaderboard(inter.guild)
     await inter.response.send_message(f"Added {delta} → {user.mention} now {st}.", ephemeral=True)
     await post_log(inter.guild, f"🛠️ Admin add {delta} for {user.mention} by {inter.user.mention}")
 
 @admin.command(name="reset")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def admin_reset(inter: discord.Interaction, user: discord.Member):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         await db.execute("""
             INSERT INTO users(user_id,current_streak,longest_streak,last_checkin_at)
             VALUES(?,?,?,?)
             ON CONFLICT(user_id) DO UPDATE SET current_streak=0
-        """, (user.id,0,0, now_utc().isoformat()))
+        """, (user.id,0,0, now_ts()))
+        if BOT_MODE == "gateway":
+            await enqueue_job(db, "leaderboard", {})   # rendered by the jobs process
         await db.commit()
-    await update_leaderboard(inter.guild)
+    if BOT_MODE != "gateway":
+        await update_leaderboard(inter.guild)
     await inter.response.send_message(f"Reset {user.mention}.", ephemeral=True)
     await post_log(inter.guild, f"⛔ Admin reset {user.mention} by {inter.user.mention}")
 
 @admin.command(name="freeze")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def admin_freeze(inter: discord.Interaction, user: discord.Member, frozen: bool):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         await db.execute("INSERT INTO users(user_id,frozen) VALUES(?,?) ON CONFLICT(user_id) DO UPDATE SET frozen=?",
                          (user.id, 1 if frozen else 0, 1 if frozen else 0))
+        if BOT_MODE == "gateway":
+            await enqueue_job(db, "leaderboard", {})   # rendered by the jobs process
         await db.commit()
-    await update_leaderboard(inter.guild)
+    if BOT_MODE != "gateway":
+        await update_leaderboard(inter.guild)
     await inter.response.send_message(f"{'Froze' if frozen else 'Unfroze'} {user.mention}.", ephemeral=True)
 
 @admin.command(name="history")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def admin_history(inter: discord.Interaction, user: discord.Member, limit: int=5):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         cur = await db.execute("""
           SELECT id,created_at,day_reported,status,similar_flag
           FROM checkins WHERE user_id=?
@@ -582,9 +1628,248 @@ async def admin_history(inter: discord.Interaction, user: discord.Member, limit:
     lines = [f"Last {len(rows)} check-ins for {user.display_name}:"]
     for cid,ts,day,status,simf in rows:
         tag = "⚠️" if simf else ""
-        lines.append(f"• #{cid} — Day {day} — {status} {tag} — {ts}")
+        lines.append(f"• #{cid} — Day {day} — {status} {tag} — {fmt_ts(ts)}")
     await inter.response.send_message("\n".join(lines), ephemeral=True)
 
+# --- Reflection search (FTS5) ---
+SEARCH_PAGE_SIZE = 5
+
+async def search_reflections(db, query: str, user_id: int|None=None, status: str|None=None,
+                             since: int|None=None, until: int|None=None,
+                             limit: int=SEARCH_PAGE_SIZE, offset: int=0):
+    """FTS5 search over reflections, newest first.
+    Ordering by the FTS rowid lets FTS5 stream matches and stop at the page, where
+    ORDER BY rank would score every match first. `query` is FTS5 syntax: words, "exact phrase", prefix*, AND/OR/NOT.
+    since/until are epoch seconds (until exclusive). Rows: (id, user_id, created_at, status, snippet)."""
+    sql = """
+      SELECT c.id, c.user_id, c.created_at, c.status,
+             snippet(checkins_fts, 0, '**', '**', '…', 16)
+      FROM checkins_fts JOIN checkins c ON c.id = checkins_fts.rowid
+      WHERE checkins_fts MATCH ?"""
+    params: list = [query]
+    if user_id is not None:
+        sql += " AND c.user_id=?"; params.append(user_id)
+    if status:
+        sql += " AND c.status=?"; params.append(status)
+    if since is not None:
+        sql += " AND c.created_at>=?"; params.append(since)
+    if until is not None:
+        sql += " AND c.created_at<?"; params.append(until)
+    sql += " ORDER BY checkins_fts.rowid DESC LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    cur = await db.execute(sql, params)
+    return await cur.fetchall()
+
+class SearchView(discord.ui.View):
+    """Prev/Next pager for /admin search results."""
+    def __init__(self, query: str, filters: dict, timeout: float = 600):
+        super().__init__(timeout=timeout)
+        self.query = query
+        self.filters = filters
+        self.page = 0
+        self.rows = []
+        self.has_next = False
+
+    async def load(self):
+        async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+            rows = await search_reflections(db, self.query, **self.filters,
+                                            limit=SEARCH_PAGE_SIZE + 1, offset=self.page * SEARCH_PAGE_SIZE)
+        self.has_next = len(rows) > SEARCH_PAGE_SIZE
+        self.rows = rows[:SEARCH_PAGE_SIZE]
+        self.prev_btn.disabled = self.page == 0
+        self.next_btn.disabled = not self.has_next
+
+    def render(self) -> str:
+        lines = [f"🔎 `{self.query[:100]}` — page {self.page + 1}"]
+        if not self.rows:
+            lines.append("_No matches._")
+        for cid, uid, ts, status, snip in self.rows:
+            lines.append(f"• #{cid} <@{uid}> — {status} — {fmt_ts(ts, 'd')}\n> {snip.replace(chr(10), ' ')[:300]}")
+        return "\n".join(lines)[:1900]
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        await self.load()
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.has_next:
+            self.page += 1
+        await self.load()
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+def _parse_day(s: str|None) -> int|None:
+    """YYYY-MM-DD option -> epoch seconds at 00:00 UTC; raises ValueError."""
+    if not s:
+        return None
+    return day_to_ts(dt.date.fromisoformat(s.strip()))
+
+@admin.command(name="search", description="Full-text search of check-in reflections")
+@app_commands.describe(query='Words, "exact phrase", prefix* (AND/OR/NOT supported)',
+                       since="From date (YYYY-MM-DD)", until="Before date (YYYY-MM-DD)")
+@app_commands.choices(status=[app_commands.Choice(name=s, value=s) for s in ("pending", "approved", "rejected", "expired")])
+@app_commands.checks.has_permissions(manage_guild=True)
+async def admin_search(inter: discord.Interaction, query: str, user: discord.Member|None=None,
+                       status: app_commands.Choice[str]|None=None, since: str|None=None, until: str|None=None):
+    if not FTS_ENABLED:
+        return await inter.response.send_message("❌ Search unavailable (SQLite built without FTS5).", ephemeral=True)
+    try:
+        filters = dict(user_id=user.id if user else None, status=status.value if status else None,
+                       since=_parse_day(since), until=_parse_day(until))
+    except ValueError:
+        return await inter.response.send_message("❌ Dates must be YYYY-MM-DD.", ephemeral=True)
+    view = SearchView(query, filters)
+    try:
+        await view.load()
+    except sqlite3.OperationalError as e:
+        return await inter.response.send_message(f"❌ Bad search query: {e}", ephemeral=True)
+    await inter.response.send_message(view.render(), view=view, ephemeral=True)
+
+@admin.command(name="reindex", description="Rebuild the reflection search index from scratch")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def admin_reindex(inter: discord.Interaction):
+    if not FTS_ENABLED:
+        return await inter.response.send_message("❌ Search unavailable (SQLite built without FTS5).", ephemeral=True)
+    await inter.response.defer(ephemeral=True, thinking=True)
+    t0 = asyncio.get_running_loop().time()
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        await db.execute("INSERT INTO checkins_fts(checkins_fts) VALUES('rebuild')")
+        await db.execute("INSERT INTO checkins_fts(checkins_fts) VALUES('optimize')")
+        await db.commit()
+    took = asyncio.get_running_loop().time() - t0
+    await inter.followup.send(f"✅ Search index rebuilt in {took:.1f}s.", ephemeral=True)
+    await post_log(inter.guild, f"🛠️ Search index rebuilt by {inter.user.mention} ({took:.1f}s)")
+
+@admin.command(name="lag", description="Event-loop lag percentiles and recent stalls")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def admin_lag(inter: discord.Interaction):
+    p = watchdog.percentiles()
+    if not p:
+        return await inter.response.send_message("No lag samples yet.", ephemeral=True)
+    lines = [f"⏱️ Loop lag over {p['n']} probes: p50 **{p['p50']:.1f}ms**, p95 **{p['p95']:.1f}ms**, "
+             f"p99 **{p['p99']:.1f}ms**, max **{p['max']:.1f}ms** • executor `{CPU_EXECUTOR}`"]
+    if duplicate_events:
+        lines.append("Duplicate events suppressed: " +
+                     ", ".join(f"{k} **{v}**" for k, v in sorted(duplicate_events.items())))
+    for when, ms, stack in list(watchdog.stalls)[-3:]:
+        last = stack.strip().splitlines()[-2:] if stack else []
+        lines.append(f"• {when} blocked {ms:.0f}ms\n```{chr(10).join(last)[:300]}```")
+    await inter.response.send_message("\n".join(lines)[:1900], ephemeral=True)
+
+# --- On-demand profiler: nothing is installed until a session starts ---
+PROFILE_MAX_SECONDS = 300
+PROFILE_HZ          = 200      # stack samples per second in "sample" mode
+_profile_lock = asyncio.Lock()
+
+def _frame_key(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _sample_stacks(thread_id: int, seconds: float, hz: int = PROFILE_HZ):
+    """Runs in a side thread: sample `thread_id`'s stack. Returns (self, cumulative, folded, n)."""
+    own, cum, folded = collections.Counter(), collections.Counter(), collections.Counter()
+    n = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_key(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            n += 1
+            own[stack[0]] += 1
+            cum.update(set(stack))
+            folded[";".join(reversed(stack))] += 1
+        time.sleep(1 / hz)
+    return own, cum, folded, n
+
+def _profile_table(rows: list[tuple[str, float, float]], unit: str, by: int, limit: int = 12) -> str:
+    out = [f"{'cum':>8} {'self':>8}  function ({unit})"]
+    for name, c, t in sorted(rows, key=lambda r: r[by], reverse=True)[:limit]:
+        out.append(f"{c:>8.2f} {t:>8.2f}  {name[:70]}")
+    return "\n".join(out)
+
+async def run_profile(seconds: int, mode: str) -> tuple[list[tuple[str, float, float]], str, str, bytes]:
+    """Profile the event-loop thread for `seconds`.
+    Returns (rows of (function, cumulative, self), unit, attachment filename, attachment bytes)."""
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()          # hooks only the calling (event-loop) thread
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            prof.disable()
+        stats = pstats.Stats(prof)
+        rows = [(f"{func} ({os.path.basename(file)}:{line})", ct, tt)
+                for (file, line, func), (cc, nc, tt, ct, callers) in stats.stats.items()]
+        return rows, "s", "profile.pstats", marshal.dumps(stats.stats)   # what pstats.dump_stats writes
+
+    # the sampler needs the GIL to look at the loop thread; with the default 5ms switch
+    # interval it would mostly wake when the loop idles in select() and miss short bursts
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(min(switch, 0.02 / PROFILE_HZ))
+    try:
+        own, cum, folded, n = await asyncio.to_thread(_sample_stacks, threading.get_ident(), seconds)
+    finally:
+        sys.setswitchinterval(switch)
+    n = max(n, 1)
+    rows = [(name, 100 * c / n, 100 * own.get(name, 0) / n) for name, c in cum.items()]
+    raw = "".join(f"{stack} {count}\n" for stack, count in folded.most_common())
+    return rows, "% of samples", "profile.folded", raw.encode()
+
+@admin.command(name="profile", description="Profile the bot's event loop for a few seconds")
+@app_commands.describe(seconds=f"How long to profile (1–{PROFILE_MAX_SECONDS})",
+                       mode="sample: low-overhead stack sampling; cprofile: exact per-call timing (slower)")
+@app_commands.choices(mode=[app_commands.Choice(name=m, value=m) for m in ("sample", "cprofile")])
+@app_commands.checks.has_permissions(manage_guild=True)
+async def admin_profile(inter: discord.Interaction, seconds: int, mode: str = "sample"):
+    if not 1 <= seconds <= PROFILE_MAX_SECONDS:
+        return await inter.response.send_message(f"Pick 1–{PROFILE_MAX_SECONDS} seconds.", ephemeral=True)
+    if _profile_lock.locked():
+        return await inter.response.send_message("A profiling session is already running.", ephemeral=True)
+    async with _profile_lock:
+        await inter.response.defer(ephemeral=True, thinking=True)
+        rows, unit, fname, raw = await run_profile(seconds, mode)
+        cum_txt = _profile_table(rows, unit, by=1)
+        self_txt = _profile_table(rows, unit, by=2)
+        head = f"🔬 {mode} profile of the event loop, {seconds}s"
+        body = f"{head}\n**By cumulative**\n```{cum_txt}```\n**By self**\n```{self_txt}```"
+        if len(body) > 1990:
+            body = f"{head}\n**By cumulative**\n```{cum_txt[:850]}```\n**By self**\n```{self_txt[:850]}```"
+        await inter.followup.send(body, file=discord.File(io.BytesIO(raw), filename=fname), ephemeral=True)
+
+@admin.command(name="effects", description="Post-approval side-effect latency and failures")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def admin_effects(inter: discord.Interaction):
+    lines = effect_summary()
+    if not lines:
+        return await inter.response.send_message("No approvals processed since start.", ephemeral=True)
+    head = f"⚙️ Side effects (timeout {EFFECT_TIMEOUT:.0f}s, {EFFECT_RETRIES} retries for {'/'.join(sorted(EFFECT_IDEMPOTENT))}, {len(_effect_tasks)} in flight):"
+    await inter.response.send_message("\n".join([head] + lines), ephemeral=True)
+
+@admin.command(name="validation", description="Validator assignment load and time-to-quorum percentiles")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def admin_validation(inter: discord.Interaction, days: app_commands.Range[int, 1, 90] = 7):
+    lines = await validation_summary(days)
+    await inter.response.send_message("\n".join(lines)[:1900], ephemeral=True)
+
+@admin.command(name="recount", description="Rebuild DB stat counters from scratch and report drift")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def admin_recount(inter: discord.Interaction):
+    await inter.response.defer(ephemeral=True)   # the full scan can outlast the 3 s ack window
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        drift = await rebuild_counters(db)
+        await db.commit()
+    if not drift:
+        return await inter.followup.send("✅ Counters verified — no drift.", ephemeral=True)
+    lines = [f"🛠️ Rebuilt counters, fixed {len(drift)} drifted value(s):"]
+    for name, (stored, actual) in sorted(drift.items())[:20]:
+        lines.append(f"• `{name}`: {stored} → {actual}")
+    await inter.followup.send("\n".join(lines), ephemeral=True)
+    await post_log(inter.guild, f"🛠️ Counters rebuilt by {inter.user.mention} ({len(drift)} drifted)")
+
 partner = app_commands.Group(name="partner", description="Accountability partner controls")
 
 @partner.command(name="request", description="Ask someone to be your accountability partner")
@@ -593,7 +1878,7 @@ async def partner_request(inter: discord.Interaction, user: discord.Member):
     if err:
         return await inter.response.send_message(err, ephemeral=True)
 
-    view = PartnerInviteView(requester_id=inter.user.id, invitee_id=user.id)
+    view = partner_invite_view(requester_id=inter.user.id, invitee_id=user.id)
     await inter.response.send_message(
         content=f"{user.mention} 📨 {inter.user.mention} wants to be accountability partners with you!",
         view=view
@@ -601,7 +1886,7 @@ async def partner_request(inter: discord.Interaction, user: discord.Member):
 
 @partner.command(name="status", description="See your current partner status")
 async def partner_status(inter: discord.Interaction):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         open_, status, other = await _has_open_partner(db, inter.user.id)
     if not open_:
         return await inter.response.send_message("You have no pending or active partner.", ephemeral=True)
@@ -629,79 +1914,312 @@ tree.add_command(partner)
 
 tree.add_command(admin)
 
-# ======= Reaction listener for quorum =======
-@bot.event
-async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
-    # --- quick debug: comment in if needed ---
-    # print(f"[raw_react] emoji={payload.emoji} ch={payload.channel_id} msg={payload.message_id} user={payload.user_id}")
+# ======= Milestone roles =======
+# Highest milestone at/under the user's streak
+MILESTONES = [
+    (730, ROLE_IMMORTAL),
+    (365, ROLE_LEGENDARY),
+    (180, ROLE_STREAK_MASTER),
+    (100, ROLE_STREAK_VETERAN),
+    (70,  ROLE_ACHIEVER),
+    (30,  ROLE_STREAK_GUARDIAN),
+    (7,   ROLE_ONE_WEEK_WARRIOR),
+]
 
-    # Highest milestone at/under the user's streak
-    MILESTONES = [
-        (730, ROLE_IMMORTAL),
-        (365, ROLE_LEGENDARY),
-        (180, ROLE_STREAK_MASTER),
-        (100, ROLE_STREAK_VETERAN),
-        (70,  ROLE_ACHIEVER),
-        (30,  ROLE_STREAK_GUARDIAN),
-        (7,   ROLE_ONE_WEEK_WARRIOR),
-    ]
-
-    def _target_role_for_streak(streak: int) -> int | None:
-        for threshold, role_id in MILESTONES:
-            if streak >= threshold and role_id:
-                return role_id
-        return None
+def _target_role_for_streak(streak: int) -> int | None:
+    for threshold, role_id in MILESTONES:
+        if streak >= threshold and role_id:
+            return role_id
+    return None
 
-    def _all_milestone_role_ids() -> set[int]:
-        return {rid for _, rid in MILESTONES if rid}
-
-    async def update_milestone_roles(guild: discord.Guild, member: discord.Member, streak_value: int):
-        """Give the correct milestone role for streak_value and remove the others."""
-        target_role_id = _target_role_for_streak(streak_value)
-        if not target_role_id:
-            # under 7 days → remove any milestone roles if they have them
-            remove_ids = _all_milestone_role_ids()
-            roles_to_remove = [guild.get_role(rid) for rid in remove_ids if guild.get_role(rid) in member.roles]
-            if roles_to_remove:
-                try:
-                    await member.remove_roles(*roles_to_remove, reason=f"Streak {streak_value} (below first milestone)")
-                except Exception:
-                    pass
-            return
+def _all_milestone_role_ids() -> set[int]:
+    return {rid for _, rid in MILESTONES if rid}
+
+async def update_milestone_roles(guild: discord.Guild, member: discord.Member, streak_value: int):
+    """Give the correct milestone role for streak_value and remove the others.
+    Permission problems are logged; other HTTP errors propagate so callers can retry."""
+    target_role_id = _target_role_for_streak(streak_value)
+    if not target_role_id:
+        # under 7 days → remove any milestone roles if they have them
+        remove_ids = _all_milestone_role_ids()
+        roles_to_remove = [guild.get_role(rid) for rid in remove_ids if guild.get_role(rid) in member.roles]
+        if roles_to_remove:
+            try:
+                await member.remove_roles(*roles_to_remove, reason=f"Streak {streak_value} (below first milestone)")
+            except discord.Forbidden:
+                pass
+        return
 
-        target_role = guild.get_role(target_role_id)
-        if not target_role:
-            return  # role not found / not set
+    target_role = guild.get_role(target_role_id)
+    if not target_role:
+        return  # role not found / not set
 
-        # Build remove list = all milestone roles except the target
-        to_remove_ids = _all_milestone_role_ids() - {target_role_id}
-        roles_to_remove = [guild.get_role(rid) for rid in to_remove_ids if guild.get_role(rid) in member.roles]
+    # Build remove list = all milestone roles except the target
+    to_remove_ids = _all_milestone_role_ids() - {target_role_id}
+    roles_to_remove = [guild.get_role(rid) for rid in to_remove_ids if guild.get_role(rid) in member.roles]
 
-        # Add target if missing; remove the rest
-        ops = []
+    # Apply in a safe order: add first, then remove others (prevents gaps if hierarchy blocks something)
+    try:
         if target_role not in member.roles:
-            ops.append(("add", target_role))
+            await member.add_roles(target_role, reason=f"Streak {streak_value} reached")
         if roles_to_remove:
-            ops.extend([("rem", r) for r in roles_to_remove])
-
-        # Apply in a safe order: add first, then remove others (prevents gaps if hierarchy blocks something)
+            await member.remove_roles(*roles_to_remove, reason=f"Streak {streak_value} reached (clean up)")
+    except discord.Forbidden:
+        # Bot lacks Manage Roles or the roles are above the bot's top role.
+        await post_log(guild, "⚠️ Could not assign milestone role (check role hierarchy & permissions).")
+
+# ======= Post-approval side effects =======
+# The reaction handler only commits the approval; everything user-visible runs here,
+# concurrently, each effect with its own timeout, retries and latency record.
+EFFECT_TIMEOUT = 10.0     # seconds per attempt
+EFFECT_RETRIES = 2        # extra attempts after a failure (not for Forbidden/NotFound)
+# Only these are safe to run twice. A send that timed out may still have gone
+# through (e.g. queued behind a rate limit), so dm/announce/log get one attempt.
+EFFECT_IDEMPOTENT = {"roles", "embed", "leaderboard"}
+
+effect_latency: dict[str, collections.deque] = collections.defaultdict(lambda: collections.deque(maxlen=512))
+effect_failures: collections.Counter = collections.Counter()
+_effect_tasks: set[asyncio.Task] = set()
+
+async def _run_effect(name: str, fn) -> bool:
+    loop = asyncio.get_running_loop()
+    retries = EFFECT_RETRIES if name in EFFECT_IDEMPOTENT else 0
+    for attempt in range(retries + 1):
+        t0 = loop.time()
         try:
-            if any(k == "add" for k, _ in ops):
-                await member.add_roles(target_role, reason=f"Streak {streak_value} reached")
-            if roles_to_remove:
-                await member.remove_roles(*roles_to_remove, reason=f"Streak {streak_value} reached (clean up)")
-        except discord.Forbidden:
-            # Bot lacks Manage Roles or the roles are above the bot's top role.
-            await post_log(guild, "⚠️ Could not assign milestone role (check role hierarchy & permissions).")
+            await asyncio.wait_for(fn(), EFFECT_TIMEOUT)
+            effect_latency[name].append((loop.time() - t0) * 1000)
+            return True
+        except (discord.Forbidden, discord.NotFound) as e:
+            err = e
+            break   # permanent: retrying won't help
         except Exception as e:
-            await post_log(guild, f"⚠️ Role assign error: {e}")
+            err = e
+            if attempt < retries:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+    effect_failures[name] += 1
+    print(f"⚠️ effect {name} failed: {type(err).__name__}: {err}")
+    return False
+
+def emit_approved(guild: discord.Guild, msg: discord.Message, chk_id: int, user_id: int, streak: int):
+    """Fire-and-forget the side effects of an approval (single-process mode)."""
+    task = asyncio.create_task(_approval_effects(guild, msg, chk_id, user_id, streak))
+    _effect_tasks.add(task)
+    task.add_done_callback(_effect_tasks.discard)
+
+async def _approval_effects(guild: discord.Guild, msg: discord.Message, chk_id: int, user_id: int, streak: int):
+    member_lock = asyncio.Lock()
+    cached: list[discord.Member] = []
+
+    async def member():
+        # roles and DM share one lookup
+        async with member_lock:
+            if not cached:
+                cached.append(await get_member(guild, user_id))
+            return cached[0]
+
+    async def roles():
+        await update_milestone_roles(guild, await member(), streak)
+
+    async def dm():
+        await (await member()).send(f"✅ Your check-in was approved. New streak: **{streak}** days.")
+
+    async def embed():
+        # Recolor the embed green; copy() keeps fields/footer/author without rebuilding them
+        new_e = msg.embeds[0].copy()
+        new_e.color = discord.Color.green()
+        await msg.edit(embed=new_e)
+
+    async def announce():
+        await msg.channel.send(f"✅ Check-in approved for <@{user_id}>! Current streak: **{streak}** days")
+
+    async def log():
+        await post_log(guild, f"✅ Approved by quorum: <@{user_id}> → {streak} days (check-in #{chk_id})")
+
+    async def leaderboard():
+        await request_leaderboard_refresh(guild)
 
+    effects = {"roles": roles, "dm": dm, "embed": embed,
+               "announce": announce, "log": log, "leaderboard": leaderboard}
+    await asyncio.gather(*(_run_effect(name, fn) for name, fn in effects.items()))
+
+_lb_lock = asyncio.Lock()
+_lb_dirty = False
+
+async def request_leaderboard_refresh(guild: discord.Guild):
+    """Coalesce refreshes: while one runs, further requests collapse into one re-run."""
+    global _lb_dirty
+    _lb_dirty = True
+    if _lb_lock.locked():
+        return
+    async with _lb_lock:
+        while _lb_dirty:
+            _lb_dirty = False
+            await update_leaderboard(guild)
+
+def effect_summary() -> list[str]:
+    lines = []
+    for name in sorted(effect_latency.keys() | effect_failures.keys()):
+        xs = sorted(effect_latency.get(name, ()))
+        pick = lambda q: xs[min(len(xs) - 1, int(q * len(xs)))] if xs else float("nan")
+        lines.append(f"• `{name}` ok {len(xs)} • p50 {pick(.5):.0f}ms • p95 {pick(.95):.0f}ms • failed {effect_failures[name]}")
+    return lines
+
+# ======= Validator assignment =======
+# Each new check-in is assigned to one validator, pinged on the card. The load map
+# (pending check-ins per validator) lives in memory: bumped on assignment, released
+# on approval, and re-read from the pending rows through a partial index every
+# ASSIGN_RESYNC seconds, which also folds in expiries and other processes' work.
+# Check-ins still pending ESCALATE_BEFORE_HOURS before expiry ping ROLE_SENIOR_VALID.
+ASSIGN_MODE           = os.getenv("ASSIGN_MODE", "least_loaded")   # least_loaded | round_robin | off
+ASSIGN_RESYNC         = 300    # seconds between load-map refreshes from the DB
+CHECKIN_EXPIRY_HOURS  = 24     # pending check-ins expire in maintenance_loop after this
+ESCALATE_BEFORE_HOURS = 6
+ESCALATE_LIST_MAX     = 15     # check-ins linked per escalation message
+
+class ValidatorAssigner:
+    def __init__(self):
+        self.load: collections.Counter[int] = collections.Counter()   # validator id -> pending assigned
+        self.roster: list[int] = []
+        self.cursor = 0
+        self.synced_at = 0.0
+
+    async def sync(self, db, guild: discord.Guild):
+        rows = await db.execute_fetchall("""
+            SELECT assigned_to, COUNT(*) FROM checkins INDEXED BY idx_checkins_assigned
+            WHERE status='pending' AND assigned_to IS NOT NULL GROUP BY assigned_to""")
+        self.load = collections.Counter(dict(rows))
+        roster = sorted(m.id for m in guild.members if not m.bot and is_validator(m))
+        if roster:   # the jobs process has no member cache; keep what we had
+            self.roster = roster
+        self.synced_at = clock.time()
+
+    async def pick(self, db, guild: discord.Guild, exclude: int) -> int | None:
+        """Next validator for a new check-in by `exclude` (never their own), or None."""
+        if ASSIGN_MODE == "off":
+            return None
+        if clock.time() - self.synced_at > ASSIGN_RESYNC:
+            await self.sync(db, guild)
+        ids = [v for v in self.roster if v != exclude]
+        if not ids:
+            return None
+        start = self.cursor % len(ids)
+        order = ids[start:] + ids[:start]   # ties go round-robin
+        vid = order[0] if ASSIGN_MODE == "round_robin" else min(order, key=lambda v: self.load[v])
+        self.cursor = ids.index(vid) + 1
+        self.load[vid] += 1
+        return vid
+
+    def release(self, vid: int | None):
+        if vid and self.load[vid] > 0:
+            self.load[vid] -= 1
+
+assigner = ValidatorAssigner()
+
+async def escalate_pending(db, guild: discord.Guild) -> int:
+    """Ping ROLE_SENIOR_VALID once about check-ins that will expire within
+    ESCALATE_BEFORE_HOURS. Returns how many were escalated. The rows are claimed
+    (escalated=1) before the send, so two processes can't both ping, and released
+    again if the send fails."""
+    now = now_ts()
+    cur = await db.execute("""
+        UPDATE checkins SET escalated=1
+        WHERE status='pending' AND escalated=0 AND created_at>=? AND created_at<?
+        RETURNING id, user_id, channel_id, message_id, created_at, assigned_to""",
+        (now - CHECKIN_EXPIRY_HOURS * 3600, now - (CHECKIN_EXPIRY_HOURS - ESCALATE_BEFORE_HOURS) * 3600))
+    rows = sorted(await cur.fetchall(), key=lambda r: r[4])
+    await db.commit()
+    if not rows:
+        return 0
+    lines = []
+    for cid, uid, ch_id, msg_id, created, vid in rows[:ESCALATE_LIST_MAX]:
+        where = f"https://discord.com/channels/{guild.id}/{ch_id}/{msg_id}" if msg_id else f"#{cid}"
+        who = f" (assigned <@{vid}>)" if vid else ""
+        lines.append(f"• <@{uid}> {where} — expires {fmt_ts(created + CHECKIN_EXPIRY_HOURS * 3600, 'R')}{who}")
+    if len(rows) > ESCALATE_LIST_MAX:
+        lines.append(f"…and {len(rows) - ESCALATE_LIST_MAX} more")
+    chan = guild.get_channel(CHANNEL_CHECKINS)
+    try:
+        if not chan:
+            raise LookupError(f"channel {CHANNEL_CHECKINS} not found")
+        await chan.send(f"<@&{ROLE_SENIOR_VALID}> {len(rows)} check-in(s) still need a validator:\n" + "\n".join(lines))
+    except Exception as e:
+        # nobody was pinged: hand the rows back so the next pass tries again
+        await db.executemany("UPDATE checkins SET escalated=0 WHERE id=?", [(r[0],) for r in rows])
+        await db.commit()
+        print(f"⚠️ escalation failed for {len(rows)} check-in(s): {type(e).__name__}: {e}")
+        return 0
+    return len(rows)
+
+def _fmt_dur(seconds: float) -> str:
+    if seconds != seconds:   # nan: no samples
+        return "–"
+    s = int(seconds)
+    if s < 60:
+        return f"{s}s"
+    if s < 3600:
+        return f"{s // 60}m"
+    return f"{s // 3600}h{s % 3600 // 60:02d}m"
+
+async def validation_summary(days: int) -> list[str]:
+    """Time-to-quorum per check-in and per validator over the last `days` days."""
+    since = now_ts() - days * 86400
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        rows = await db.execute_fetchall("""
+            SELECT status, assigned_to, escalated, quorum_at - created_at FROM checkins
+            WHERE created_at>=?""", (since,))
+        responses = await db.execute_fetchall("""
+            SELECT v.validator_id, v.reacted_at - c.created_at FROM checkins c
+            JOIN validations v ON v.checkin_id=c.id WHERE c.created_at>=?""", (since,))
+    pick = lambda xs, q: sorted(xs)[min(len(xs) - 1, int(q * len(xs)))] if xs else float("nan")
+    status = collections.Counter(r[0] for r in rows)
+    ttq = [r[3] for r in rows if r[3] is not None]
+    lines = [f"⏱️ Last {days}d: **{len(rows)}** check-ins • approved **{status['approved']}** • "
+             f"expired **{status['expired']}** • escalated **{sum(r[2] for r in rows)}** • "
+             f"pending **{status['pending']}** (mode `{ASSIGN_MODE}`)",
+             f"Time to quorum: p50 **{_fmt_dur(pick(ttq, .5))}** • p95 **{_fmt_dur(pick(ttq, .95))}**"]
+    assigned, resp = collections.defaultdict(list), collections.defaultdict(list)
+    expired = collections.Counter()
+    for st, vid, _, q in rows:
+        if vid is None:
+            continue
+        assigned[vid].append(q)
+        expired[vid] += st == "expired"
+    for vid, secs in responses:
+        resp[vid].append(secs)
+    for vid in sorted(assigned.keys() | resp.keys(), key=lambda v: -len(assigned.get(v, ())))[:15]:
+        q = [x for x in assigned.get(vid, ()) if x is not None]
+        r = resp.get(vid, [])
+        lines.append(f"• <@{vid}> assigned **{len(assigned.get(vid, ()))}** ({expired[vid]} expired) • "
+                     f"quorum p50 {_fmt_dur(pick(q, .5))} / p95 {_fmt_dur(pick(q, .95))} • "
+                     f"reacted **{len(r)}** p50 {_fmt_dur(pick(r, .5))} / p95 {_fmt_dur(pick(r, .95))} • "
+                     f"load {assigner.load[vid]}")
+    return lines
+
+# ======= Reaction listener for quorum =======
+@bot.event
+async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
+    # --- quick debug: comment in if needed ---
+    # print(f"[raw_react] emoji={payload.emoji} ch={payload.channel_id} msg={payload.message_id} user={payload.user_id}")
+    if RECORD_PATH:
+        record_event("reaction", user=_anon(payload.user_id), message=_anon(payload.message_id),
+                     channel="checkins" if payload.channel_id == CHANNEL_CHECKINS else _anon(payload.channel_id),
+                     emoji=str(payload.emoji), flags=_member_flags(getattr(payload, "member", None)))
 
     # 1) Filter for the right emoji and channel
     if str(payload.emoji) != "✅":
         return
     if payload.channel_id != CHANNEL_CHECKINS:
         return
+    if bot.user and payload.user_id == bot.user.id:
+        return   # the bot's own ✅ on new cards
+
+    # Drop redeliveries of an already counted ✅ before any HTTP or DB work
+    key = f"r:{payload.message_id}:{payload.user_id}"
+    if key in _seen_events:
+        _seen_events.move_to_end(key)
+        duplicate_events["reaction:memory"] += 1
+        return
 
     guild = bot.get_guild(GUILD_ID)
     if not guild:
@@ -720,6 +2238,7 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
     # ignore bots and non-validators
     if member.bot:
         return
+    member_cache.touch(guild, member)
     if not is_validator(member):
         return
 
@@ -733,19 +2252,29 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
         return
 
     # 4) Look up the pending check-in row for this message
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute(
-            "SELECT id, user_id, status FROM checkins WHERE message_id=?",
-            (msg.id,)
-        )
-        row = await cur.fetchone()
-
-    if not row:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        row = await db_fetchone(db,
+            "SELECT id, user_id, status, created_at, assigned_to FROM checkins WHERE message_id=?", msg.id)
+    if not row or row[2] != "pending":
         return
 
-    chk_id, target_uid, status = row
-    if status != "pending":
+    # Each (message, validator) pair is counted once, even after RESUME or un-react/re-react.
+    # Claimed only here, so a ✅ ignored above (card not stored yet, fetch failed) isn't burned.
+    if not await claim_event(key, "reaction"):
         return
+    try:
+        await _count_checkin_reaction(guild, member, msg, row)
+    except Exception:
+        await release_event(key)
+        raise
+
+async def _count_checkin_reaction(guild: discord.Guild, member: discord.Member, msg: discord.Message, row):
+    chk_id, target_uid, status, chk_created, assignee = row
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        # this validator's response time (see validation_summary)
+        await db.execute("INSERT OR IGNORE INTO validations(checkin_id, validator_id, reacted_at) VALUES(?,?,?)",
+                         (chk_id, member.id, now_ts()))
+        await db.commit()
 
     # 5) Count validator reactions (weighted), including this new reaction
     validators = set()
@@ -756,7 +2285,7 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
             async for u in reaction.users():
                 if u.bot:
                     continue
-                m = guild.get_member(u.id) or (await guild.fetch_member(u.id))
+                m = await get_member(guild, u.id)
                 if m and is_validator(m):
                     if m.id not in validators:
                         validators.add(m.id)
@@ -767,109 +2296,627 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
         return
 
     # 7) Quorum reached: APPROVE the check-in and update streaks (schema = current_streak/longest_streak)
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Double-check still pending (avoid race)
-        cur = await db.execute("SELECT status FROM checkins WHERE id=?", (chk_id,))
-        st_row = await cur.fetchone()
-        if not st_row or st_row[0] != "pending":
-            return
-
-        # Cooldown enforcement
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        await db.execute("BEGIN IMMEDIATE")   # serialize the read-modify-write of the user's streak
         cur = await db.execute(
-            "SELECT current_streak,longest_streak,last_checkin_at FROM users WHERE user_id=?",
+            "SELECT current_streak,longest_streak,last_checkin_at,frozen FROM users WHERE user_id=?",
             (target_uid,)
         )
         u = await cur.fetchone()
-        last_iso = u[2] if u else None
-        hrs = hours_since(last_iso)
-        if last_iso and hrs < MIN_HOURS:
-            await db.execute(
-                "UPDATE checkins SET status='rejected', reason='cooldown' WHERE id=?",
+        last_ts = u[2] if u else None
+        hrs = hours_since(last_ts)
+        if last_ts is not None and hrs < MIN_HOURS:
+            cur = await db.execute(
+                "UPDATE checkins SET status='rejected', reason='cooldown' WHERE id=? AND status='pending'",
                 (chk_id,)
             )
             await db.commit()
-            await post_log(guild, f"❌ Rejected (cooldown) for <@{target_uid}> on #{chk_id}")
+            if cur.rowcount:
+                assigner.release(assignee)
+                await post_log(guild, f"❌ Rejected (cooldown) for <@{target_uid}> on #{chk_id}")
+            return
+
+        # Compare-and-set: only one concurrent handler gets to approve
+        now = now_ts()
+        cur = await db.execute("UPDATE checkins SET status='approved', quorum_at=? WHERE id=? AND status='pending'",
+                               (now, chk_id))
+        if cur.rowcount == 0:
+            await db.rollback()
             return
 
-        current = (u[0] if u else 0) + 1
+        # submitted after the window closed: start over (the sweep may not have run yet)
+        lapsed = last_ts is not None and not u[3] and chk_created - last_ts > MAX_HOURS * 3600
+        current = (0 if not u or lapsed else u[0]) + 1
         longest = max(u[1], current) if u else current
-        nowiso = now_utc().isoformat()
+        await cal_mark(db, target_uid, chk_created)
 
-        # Write user streak + approve the check-in
+        # Write user streak
         await db.execute("""
             INSERT INTO users(user_id,current_streak,longest_streak,last_checkin_at)
             VALUES(?,?,?,?)
             ON CONFLICT(user_id) DO UPDATE SET current_streak=?,
                                               longest_streak=?,
                                               last_checkin_at=?
-        """, (target_uid, current, longest, nowiso, current, longest, nowiso))
-
-        await db.execute("UPDATE checkins SET status='approved' WHERE id=?", (chk_id,))
+        """, (target_uid, current, longest, now, current, longest, now))
+        if BOT_MODE == "gateway":
+            # committed together with the approval, so a crash can't lose the side effects
+            await enqueue_job(db, "approval_effects", {
+                "chk_id": chk_id, "user_id": target_uid, "streak": current,
+                "channel_id": msg.channel.id, "message_id": msg.id})
         await db.commit()
-
-    try:
-        member_to_update = guild.get_member(target_uid) or await guild.fetch_member(target_uid)
-        if member_to_update: 
-            await update_milestone_roles(guild, member_to_update, current)
-    except Exception as e: 
-        await post_log(guild, f"⚠️ Error updating roles for <@{target_uid}>: {e}")
-
-    # 8) DM user (best effort), update embed color, log, refresh leaderboard
-    try:
-        user = guild.get_member(target_uid) or await guild.fetch_member(target_uid)
-        if user:
-            try:
-                await user.send(f"✅ Your check-in was approved. New streak: **{current}** days.")
-            except Exception:
-                pass
-    except Exception:
-        pass
-
-    # Rebuild the embed in green while preserving fields/footer/author
-    try:
-        old = msg.embeds[0]
-        new_e = discord.Embed(title=old.title, description=old.description, color=discord.Color.green())
-        for f in old.fields:
-            new_e.add_field(name=f.name, value=f.value, inline=f.inline)
-        if old.footer:
-            new_e.set_footer(text=old.footer.text, icon_url=getattr(old.footer, "icon_url", None))
-        if old.author:
-            new_e.set_author(name=old.author.name, icon_url=getattr(old.author, "icon_url", None))
-        await msg.edit(embed=new_e)
-    except Exception:
-        pass
-
-    await msg.channel.send(f"✅ Check-in approved for <@{target_uid}>! Current streak: **{current}** days")
-    await post_log(guild, f"✅ Approved by quorum: <@{target_uid}> → {current} days (check-in #{chk_id})")
-    await update_leaderboard(guild)
-
+    assigner.release(assignee)
+
+    # 8) Roles, DMs, embed, announcement, log and leaderboard run in the background
+    if BOT_MODE != "gateway":
+        emit_approved(guild, msg, chk_id, target_uid, current)
+
+
+# ======= Check-in calendars (per-user day bitsets) =======
+CAL_EPOCH = dt.date(2024, 1, 1)
+_CAL_EPOCH_DAY = day_to_ts(CAL_EPOCH) // 86400
+
+def cal_day(ts: int) -> int:
+    """Bit index of the UTC day containing ts."""
+    return ts // 86400 - _CAL_EPOCH_DAY
+
+def _cal_pack(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+async def rebuild_calendars(db, user_id: int | None = None) -> int:
+    """Recompute bitsets from approved check-ins (all users, or one). Caller commits."""
+    where, params = ("AND user_id=?", (user_id,)) if user_id is not None else ("", ())
+    cur = await db.execute(f"SELECT user_id, created_at FROM checkins WHERE status='approved' {where}", params)
+    cal: dict[int, int] = collections.defaultdict(int)
+    for uid, ts in await cur.fetchall():
+        d = cal_day(ts)
+        if d >= 0:
+            cal[uid] |= 1 << d
+    await db.execute(f"DELETE FROM calendars WHERE 1=1 {where}", params)
+    await db.executemany("INSERT INTO calendars(user_id, bits) VALUES(?,?)",
+                         [(uid, _cal_pack(bits)) for uid, bits in cal.items()])
+    return len(cal)
+
+async def get_calendar(db, user_id: int) -> int:
+    """The user's bitset as an int (rebuilt from rows if it was invalidated). Caller commits."""
+    row = await db_fetchone(db, "SELECT bits FROM calendars WHERE user_id=?", user_id)
+    if row is None:
+        await rebuild_calendars(db, user_id)
+        row = await db_fetchone(db, "SELECT bits FROM calendars WHERE user_id=?", user_id)
+    return int.from_bytes(row[0], "little") if row else 0
+
+async def cal_mark(db, user_id: int, ts: int):
+    """Set the day of an approved check-in. Call inside the approval transaction."""
+    d = cal_day(ts)
+    if d < 0:
+        return
+    bits = await get_calendar(db, user_id)   # a missing row is rebuilt, approval included
+    if not bits >> d & 1:
+        await db.execute("INSERT OR REPLACE INTO calendars(user_id, bits) VALUES(?,?)",
+                         (user_id, _cal_pack(bits | 1 << d)))
+
+def cal_count(bits: int, first: int = 0, last: int | None = None) -> int:
+    """Days set in [first, last]."""
+    if last is not None:
+        bits &= (1 << (last + 1)) - 1
+    return (bits >> max(first, 0)).bit_count()
+
+def cal_longest_run(bits: int) -> int:
+    n = 0
+    while bits:
+        bits &= bits >> 1   # each pass shortens every run by one
+        n += 1
+    return n
+
+def cal_run_ending(bits: int, day: int) -> int:
+    """Consecutive days set ending at `day`."""
+    if day < 0:
+        return 0
+    gaps = ~bits & ((1 << (day + 1)) - 1)
+    return day + 1 if gaps == 0 else day - gaps.bit_length() + 1
+
+def render_calendar(bits: int, today: int, weeks: int) -> str:
+    """GitHub-style grid: rows Mon..Sun, one column per week, newest on the right."""
+    start = today - (weeks - 1) * 7 - (CAL_EPOCH + dt.timedelta(days=today)).weekday()
+    rows = []
+    for wd, name in enumerate(("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")):
+        cells = []
+        for w in range(weeks):
+            d = start + w * 7 + wd
+            cells.append(" " if d > today else "·" if d < 0 or not bits >> d & 1 else "█")
+        rows.append(f"{name} {''.join(cells)}")
+    return "\n".join(rows)
+
+@tree.command(name="calendar", description="Heatmap of approved check-in days")
+@app_commands.describe(weeks="How many weeks to show (1–52)")
+async def calendar_cmd(interaction: discord.Interaction, user: discord.Member|None=None, weeks: int=26):
+    user = user or interaction.user
+    weeks = max(1, min(weeks, 52))
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        bits = await get_calendar(db, user.id)
+        await db.commit()
+    if not bits:
+        return await interaction.response.send_message(f"{user.mention} has no approved check-ins yet.", ephemeral=True)
+    today = cal_day(now_ts())
+    year_start = (dt.date(now_utc().year, 1, 1) - CAL_EPOCH).days
+    current = cal_run_ending(bits, today) or cal_run_ending(bits, today - 1)
+    stats = (f"**{cal_count(bits)}** days total • **{cal_count(bits, year_start, today)}** this year • "
+             f"**{cal_count(bits, today - 29, today)}**/30 last month • current run **{current}** • "
+             f"longest run **{cal_longest_run(bits)}**")
+    await interaction.response.send_message(
+        f"📅 **{user.display_name}** — last {weeks} weeks\n```{render_calendar(bits, today, weeks)}```{stats}",
+        ephemeral=True)
+
+# ======= Lapsed-streak sweep =======
+SWEEP_ROLE_BATCH = 10      # members demoted concurrently
+SWEEP_ROLE_PAUSE = 1.0     # seconds between batches (role edits share a rate limit)
+
+async def sweep_lapsed_streaks(db) -> list[int]:
+    """Zero every unfrozen streak whose MAX_HOURS window has closed. Members with a
+    check-in submitted inside the window and still awaiting validators are left alone.
+    Returns the affected user ids. Caller commits."""
+    cur = await db.execute("""
+        UPDATE users INDEXED BY idx_users_live_deadline SET current_streak=0
+        WHERE current_streak>0 AND frozen=0 AND last_checkin_at<?
+          AND NOT EXISTS (SELECT 1 FROM checkins c
+                          WHERE c.status='pending' AND c.user_id=users.user_id
+                            AND c.created_at<=users.last_checkin_at+?)
+        RETURNING user_id""", (now_ts() - MAX_HOURS * 3600, MAX_HOURS * 3600))
+    return [r[0] for r in await cur.fetchall()]
+
+async def demote_lapsed(guild: discord.Guild, user_ids: list[int]) -> tuple[int, int]:
+    """Strip milestone roles from lapsed members in paced batches. Returns (demoted, failed)."""
+    milestone_ids = _all_milestone_role_ids()
+    demoted = failed = 0
+
+    async def demote(uid: int):
+        nonlocal demoted, failed
+        try:
+            member = await get_member(guild, uid)
+            if not any(r.id in milestone_ids for r in member.roles):
+                return
+            await update_milestone_roles(guild, member, 0)
+            demoted += 1
+        except discord.NotFound:
+            pass   # left the server
+        except discord.HTTPException:
+            failed += 1
+
+    for i in range(0, len(user_ids), SWEEP_ROLE_BATCH):
+        if i:
+            await clock.sleep(SWEEP_ROLE_PAUSE)
+        await asyncio.gather(*(demote(uid) for uid in user_ids[i:i + SWEEP_ROLE_BATCH]))
+    return demoted, failed
 
 # ======= Background task: expire pending after 24h & freeze weekly =======
-async def maintenance_loop():
-    await bot.wait_until_ready()
-    guild = bot.get_guild(GUILD_ID)
+async def maintenance_loop(guild=None):
+    if guild is None:
+        await bot.wait_until_ready()
+        guild = bot.get_guild(GUILD_ID)
     while not bot.is_closed():
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
+            async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+                # ping senior validators about pendings close to expiry
+                n_esc = await escalate_pending(db, guild)
+                if n_esc:
+                    await post_log(guild, f"📣 Escalated {n_esc} pending check-in(s) to senior validators "
+                                          f"({ESCALATE_BEFORE_HOURS}h before expiry)")
+
                 # expire >24h pendings
-                cutoff = (now_utc() - dt.timedelta(hours=24)).isoformat()
+                cutoff = now_ts() - CHECKIN_EXPIRY_HOURS * 3600
                 cur = await db.execute("SELECT id, user_id FROM checkins WHERE status='pending' AND created_at<?", (cutoff,))
                 rows = await cur.fetchall()
                 for cid, uid in rows:
                     await db.execute("UPDATE checkins SET status='expired' WHERE id=?", (cid,))
                     await post_log(guild, f"⏳ Expired check-in #{cid} for <@{uid}> (no quorum)")
                 await db.commit()
+                if rows:
+                    await assigner.sync(db, guild)
+
+                # expire stale partner invites (buttons answer "no longer pending")
+                n_inv = await expire_partner_invites(db)
+                await db.commit()
+                if n_inv:
+                    await post_log(guild, f"⏳ Expired {n_inv} partner invite(s) older than {PARTNER_INVITE_HOURS}h")
+
+                # job queue / event ledger housekeeping
+                await prune_jobs(db)
+                await prune_event_ledger(db)
+                await db.commit()
 
                 # weekly freeze check
                 # if user has validated streak but no message in weekly channel in last 7 days -> frozen=1
                 # This is a lightweight heuristic using Discord search via audit is not available here.
                 # Instead, we keep frozen manual for now OR plug in via admin command / external task.
                 # (You can turn off if not needed.)
+
+                # reset streaks whose window closed (frozen members are skipped)
+                lapsed = await sweep_lapsed_streaks(db)
+                await db.commit()
+            if lapsed:
+                demoted, failed = await demote_lapsed(guild, lapsed)
+                fail_txt = f", {failed} failed" if failed else ""
+                await post_log(guild, f"🧹 Reset {len(lapsed)} lapsed streak(s) (no approved check-in within {MAX_HOURS}h); "
+                                      f"milestone roles removed from {demoted}{fail_txt}")
+                await request_leaderboard_refresh(guild)
         except Exception as e:
             try:
                 await post_log(guild, f"⚠️ maintenance error: {e}")
             except: pass
-        await asyncio.sleep(1800)  # run every 30 minutes
+        await clock.sleep(1800)  # run every 30 minutes
+
+# ======= Check-in reminders =======
+# One timer sleeps until the earliest reminders.next_at (index lookup), claims a
+# batch of due rows and advances their stage in the same transaction, then DMs
+# them at REMINDER_RATE. Rows are advanced before sending, so a restart can drop
+# a reminder but never repeat one.
+REMINDER_BATCH     = 200
+REMINDER_RATE      = 5.0      # DMs per second
+REMINDER_GRACE     = 3600     # reminders more than this late (bot was down) are skipped, not sent
+REMINDER_MAX_SLEEP = 600      # re-check at least this often (other processes may add reminders)
+
+_reminder_wake = asyncio.Event()
+_reminder_task: asyncio.Task | None = None
+reminder_stats = collections.Counter()
+
+def _reminder_schedule(anchor: int | None, now: int) -> tuple[str | None, int | None]:
+    """Next (stage, due_at) after `now` for a user whose last approved check-in was `anchor`."""
+    if anchor is None:
+        return None, None
+    opens = anchor + MIN_HOURS * 3600
+    closing = anchor + (MAX_HOURS - REMINDER_LEAD_HOURS) * 3600
+    if now < opens:
+        return "open", opens
+    if now < closing:
+        return "closing", closing
+    return None, None
+
+async def set_reminders(user_id: int, enabled: bool) -> tuple[str | None, int | None]:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        if not enabled:
+            await db.execute("DELETE FROM reminders WHERE user_id=?", (user_id,))
+            await db.commit()
+            return None, None
+        row = await db_fetchone(db, "SELECT last_checkin_at FROM users WHERE user_id=?", user_id)
+        anchor = row[0] if row else None
+        stage, due = _reminder_schedule(anchor, now_ts())
+        await db.execute("INSERT OR REPLACE INTO reminders(user_id, anchor, stage, next_at) VALUES(?,?,?,?)",
+                         (user_id, anchor, stage, due))
+        await db.commit()
+    _reminder_wake.set()
+    return stage, due
+
+async def _claim_reminders(now: int) -> list[tuple[int, str, int, int]]:
+    """Take up to REMINDER_BATCH due reminders, advancing each to its next stage.
+    Returns [(user_id, stage, due_at, anchor)] for the reminders that fired."""
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        cur = await db.execute("""SELECT user_id, stage, next_at, anchor FROM reminders
+                                  WHERE next_at<=? ORDER BY next_at LIMIT ?""", (now, REMINDER_BATCH))
+        due = await cur.fetchall()
+        nxt = []
+        for uid, stage, at, anchor in due:
+            n_stage, n_at = _reminder_schedule(anchor, at)
+            nxt.append((n_stage, n_at, uid))
+        await db.executemany("UPDATE reminders SET stage=?, next_at=? WHERE user_id=?", nxt)
+        # a "closing" reminder is pointless if a check-in is already waiting for validators
+        pending = set()
+        closing = [(uid, anchor) for uid, stage, _, anchor in due if stage == "closing"]
+        if closing:
+            cur = await db.execute(f"""SELECT DISTINCT user_id FROM checkins
+                                       WHERE status='pending' AND user_id IN ({",".join("?" * len(closing))})""",
+                                   [uid for uid, _ in closing])
+            pending = {r[0] for r in await cur.fetchall()}
+        await db.commit()
+    return [r for r in due if r[0] not in pending]
+
+async def _send_reminder(user_id: int, stage: str, anchor: int):
+    user = bot.get_user(user_id) or await bot.fetch_user(user_id)
+    if stage == "open":
+        text = "🔔 Your next check-in is open — use `/checkin` when you're ready."
+    else:
+        closes = anchor + MAX_HOURS * 3600
+        text = f"⏰ Your check-in window closes {fmt_ts(closes, 'R')}. Check in with `/checkin` to keep your streak!"
+    await user.send(text + "\n_Turn these off with `/reminders enabled:False`._")
+
+async def reminder_loop():
+    while not bot.is_closed():
+        try:
+            async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+                row = await db_fetchone(db, "SELECT MIN(next_at) FROM reminders WHERE next_at IS NOT NULL")
+            next_at = row[0] if row else None
+            wait = REMINDER_MAX_SLEEP if next_at is None else min(REMINDER_MAX_SLEEP, next_at - now_ts())
+            if wait > 0:
+                _reminder_wake.clear()
+                await clock.wait(_reminder_wake, wait)
+                continue
+
+            now = now_ts()
+            for uid, stage, due_at, anchor in await _claim_reminders(now):
+                if now - due_at > REMINDER_GRACE:
+                    reminder_stats["skipped_late"] += 1
+                    continue
+                try:
+                    await _send_reminder(uid, stage, anchor)
+                    reminder_stats[f"sent_{stage}"] += 1
+                except discord.Forbidden:
+                    reminder_stats["dm_closed"] += 1
+                except discord.HTTPException as e:
+                    reminder_stats["failed"] += 1
+                    print(f"⚠️ reminder to {uid} failed: {e}")
+                await clock.sleep(1 / REMINDER_RATE)
+        except Exception as e:
+            print(f"⚠️ reminder loop error: {e}")
+            await clock.sleep(30)
+
+@tree.command(name="reminders", description="DM me when my next check-in opens and before my window closes")
+async def reminders_cmd(inter: discord.Interaction, enabled: bool):
+    stage, due = await set_reminders(inter.user.id, enabled)
+    if not enabled:
+        return await inter.response.send_message("🔕 Reminders off.", ephemeral=True)
+    nxt = f" Next one {fmt_ts(due, 'R')}." if due else " They start after your next approved check-in."
+    await inter.response.send_message(f"🔔 Reminders on.{nxt}", ephemeral=True)
+
+# ======= Backups: chunked online backup, rotation, restore =======
+BACKUP_DIR         = os.getenv("BACKUP_DIR", "/data/backups")
+BACKUP_KEEP        = 7        # rotated copies to keep
+BACKUP_EVERY_HOURS = 24
+BACKUP_RETRY       = 3600     # seconds before retrying a failed scheduled backup
+
+_backup_lock = asyncio.Lock()
+_backup_task: asyncio.Task | None = None
+
+def _backup_file_sync(src_path: str, dst_path: str) -> dict:
+    """Snapshot with VACUUM INTO: one read transaction, so in WAL mode writers carry
+    on and, unlike a stepped backup(), it never restarts when they commit.
+    Runs in a worker thread; the sqlite calls release the GIL."""
+    if os.path.exists(dst_path):
+        os.remove(dst_path)   # leftover from a crashed run; VACUUM INTO needs a new file
+    src = sqlite3.connect(src_path)
+    try:
+        src.execute("VACUUM INTO ?", (dst_path,))
+    finally:
+        src.close()
+    dst = sqlite3.connect(dst_path)
+    try:
+        integrity = dst.execute("PRAGMA integrity_check").fetchone()[0]
+        pages = dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+    return {"pages": pages, "integrity": integrity}
+
+def _backup_names() -> list[str]:
+    """Rotated backup file names, oldest first (the UTC stamp sorts)."""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    return sorted(n for n in os.listdir(BACKUP_DIR) if n.startswith("streaks-") and n.endswith(".db"))
+
+def _last_backup_ts() -> float | None:
+    """When the newest backup was taken, from the stamp in its name."""
+    for n in reversed(_backup_names()):
+        try:
+            taken = dt.datetime.strptime(n[len("streaks-"):-len(".db")], "%Y%m%d-%H%M%S")
+        except ValueError:
+            continue
+        return taken.replace(tzinfo=dt.timezone.utc).timestamp()
+    return None
+
+def _rotate_backups(keep: int = BACKUP_KEEP) -> list[str]:
+    names = _backup_names()
+    removed = names[:-keep] if keep > 0 else names
+    for n in removed:
+        os.remove(os.path.join(BACKUP_DIR, n))
+    return removed
+
+async def _probe_loop_lag(samples: list[float], interval: float = 0.01):
+    """Record how late a short sleep wakes up (ms) until cancelled — a proxy for handler latency."""
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, (loop.time() - t0 - interval) * 1000))
+
+async def backup_db() -> dict:
+    """Take one verified, rotated backup of DB_PATH. Returns stats for logging."""
+    async with _backup_lock:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        stamp = now_utc().strftime("%Y%m%d-%H%M%S")
+        final = os.path.join(BACKUP_DIR, f"streaks-{stamp}.db")
+        tmp = final + ".part"
+        lag: list[float] = []
+        probe = asyncio.create_task(_probe_loop_lag(lag))
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        try:
+            stats = await asyncio.to_thread(_backup_file_sync, DB_PATH, tmp)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            probe.cancel()
+        stats["seconds"] = loop.time() - t0
+        if stats["integrity"] != "ok":
+            os.remove(tmp)
+            raise RuntimeError(f"backup failed integrity_check: {stats['integrity']}")
+        os.replace(tmp, final)
+        stats["path"] = final
+        stats["bytes"] = os.path.getsize(final)
+        stats["rotated"] = _rotate_backups()
+        lag.sort()
+        stats["lag_p95_ms"] = lag[int(0.95 * (len(lag) - 1))] if lag else 0.0
+        stats["lag_max_ms"] = lag[-1] if lag else 0.0
+        return stats
+
+def _fmt_backup(stats: dict) -> str:
+    return (f"💾 Backup `{os.path.basename(stats['path'])}` — {stats['bytes'] / 1e6:.1f} MB, "
+            f"{stats['pages']} pages in {stats['seconds']:.2f}s, integrity ok, "
+            f"loop lag p95 {stats['lag_p95_ms']:.1f}ms / max {stats['lag_max_ms']:.1f}ms"
+            + (f", rotated {len(stats['rotated'])}" if stats["rotated"] else ""))
+
+async def backup_loop(guild=None):
+    if guild is None:
+        await bot.wait_until_ready()
+        guild = bot.get_guild(GUILD_ID)
+    while not bot.is_closed():
+        # schedule from the newest backup, so restarts don't keep pushing it back
+        last = _last_backup_ts()
+        wait = (last or 0) + BACKUP_EVERY_HOURS * 3600 - clock.time()
+        if wait > 0:
+            await clock.sleep(wait)
+        try:
+            stats = await backup_db()
+            await post_log(guild, _fmt_backup(stats))
+        except Exception as e:
+            try:
+                await post_log(guild, f"⚠️ backup error: {e}")
+            except: pass
+            await clock.sleep(BACKUP_RETRY)
+
+@admin.command(name="backup", description="Take a database backup now")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def admin_backup(inter: discord.Interaction):
+    await inter.response.defer(ephemeral=True, thinking=True)
+    try:
+        stats = await backup_db()
+    except Exception as e:
+        return await inter.followup.send(f"❌ Backup failed: {e}", ephemeral=True)
+    await inter.followup.send(_fmt_backup(stats), ephemeral=True)
+    await post_log(inter.guild, f"{_fmt_backup(stats)} (by {inter.user.mention})")
+
+def restore_db(backup_path: str):
+    """Offline restore (bot must be stopped): verify the backup, keep a copy of the
+    current DB next to it, then copy the backup over DB_PATH via the backup API."""
+    src = sqlite3.connect(f"file:{backup_path}?mode=ro", uri=True)
+    try:
+        res = src.execute("PRAGMA integrity_check").fetchone()[0]
+        if res != "ok":
+            raise SystemExit(f"❌ {backup_path} failed integrity_check: {res}")
+        if os.path.exists(DB_PATH):
+            keep = f"{DB_PATH}.pre-restore-{now_utc().strftime('%Y%m%d-%H%M%S')}"
+            cur_db = sqlite3.connect(DB_PATH)
+            with sqlite3.connect(keep) as k:
+                cur_db.backup(k)
+            cur_db.close()
+            print(f"Saved current DB to {keep}")
+        dst = sqlite3.connect(DB_PATH)
+        src.backup(dst)
+        dst.close()
+    finally:
+        src.close()
+    print(f"✅ Restored {DB_PATH} from {backup_path}")
+
+# ======= Job queue: gateway / worker split =======
+JOB_POLL         = 0.5     # seconds an idle worker waits before polling again
+JOB_LEASE        = 300     # a running job not finished within this is handed to another worker
+JOB_MAX_ATTEMPTS = 5
+JOB_KEEP_HOURS   = 24      # finished jobs are pruned after this
+JOB_WORKERS      = int(os.getenv("JOB_WORKERS", "4"))   # concurrent consumers per jobs process
+
+async def enqueue_job(db, kind: str, payload: dict, delay: int = 0):
+    """Queue work for run_jobs. Caller commits (so it can share the caller's transaction)."""
+    now = now_ts()
+    await db.execute("INSERT INTO jobs(kind, payload, available_at, created_at) VALUES(?,?,?,?)",
+                     (kind, json.dumps(payload), now + delay, now))
+
+async def claim_job(db, worker: str):
+    """Atomically take the oldest ready job: (id, kind, payload, attempts) or None."""
+    now = now_ts()
+    # read-only probe first: idle workers shouldn't take the write lock on every poll
+    cur = await db.execute("SELECT 1 FROM jobs WHERE status='queued' AND available_at<=? LIMIT 1", (now,))
+    if not await cur.fetchone():
+        return None
+    cur = await db.execute("""
+        UPDATE jobs SET status='running', locked_by=?, locked_at=?, attempts=attempts+1
+        WHERE id = (SELECT id FROM jobs WHERE status='queued' AND available_at<=?
+                    ORDER BY available_at, id LIMIT 1)
+          AND status='queued'
+        RETURNING id, kind, payload, attempts""", (worker, now, now))
+    row = await cur.fetchone()
+    await db.commit()
+    if not row:
+        return None
+    return row[0], row[1], json.loads(row[2]), row[3]
+
+async def finish_job(db, job_id: int, attempts: int, error: str | None = None):
+    if error is None:
+        await db.execute("UPDATE jobs SET status='done', locked_by=NULL WHERE id=?", (job_id,))
+    elif attempts >= JOB_MAX_ATTEMPTS:
+        await db.execute("UPDATE jobs SET status='failed', last_error=? WHERE id=?", (error[:500], job_id))
+    else:
+        await db.execute("""UPDATE jobs SET status='queued', locked_by=NULL, last_error=?, available_at=?
+                            WHERE id=?""", (error[:500], now_ts() + 5 * 2 ** attempts, job_id))
+    await db.commit()
+
+async def prune_jobs(db):
+    """Requeue jobs whose worker died mid-run and drop old finished ones. Caller commits."""
+    now = now_ts()
+    await db.execute("UPDATE jobs SET status='queued', locked_by=NULL WHERE status='running' AND locked_at<?",
+                     (now - JOB_LEASE,))
+    await db.execute("DELETE FROM jobs WHERE status='done' AND created_at<?", (now - JOB_KEEP_HOURS * 3600,))
+
+async def _job_approval_effects(guild, p: dict):
+    msg = await guild.get_channel(p["channel_id"]).fetch_message(p["message_id"])
+    await _approval_effects(guild, msg, p["chk_id"], p["user_id"], p["streak"])
+
+async def _job_leaderboard(guild, p: dict):
+    await request_leaderboard_refresh(guild)
+
+JOB_HANDLERS = {
+    "approval_effects": _job_approval_effects,
+    "leaderboard": _job_leaderboard,
+}
+
+async def run_jobs(guild, worker: str, stop: asyncio.Event | None = None):
+    """Consume the job queue until `stop` is set (forever if None)."""
+    while not (stop and stop.is_set()):
+        async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+            job = await claim_job(db, worker)
+        if not job:
+            await clock.sleep(JOB_POLL)
+            continue
+        job_id, kind, payload, attempts = job
+        err = None
+        try:
+            handler = JOB_HANDLERS[kind]
+            await handler(guild, payload)
+        except Exception as e:
+            err = f"{type(e).__name__}: {e}"
+            print(f"⚠️ job #{job_id} {kind} attempt {attempts} failed: {err}")
+        async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
+            await finish_job(db, job_id, attempts, err)
+
+class RestGuild:
+    """Gateway-less stand-in for discord.Guild in the jobs process: channels are
+    PartialMessageables and members always come from REST; the rest is delegated
+    to a guild fetched over REST (which includes its roles)."""
+    def __init__(self, guild: discord.Guild):
+        self._guild = guild
+
+    def __getattr__(self, name):
+        return getattr(self._guild, name)
+
+    def get_channel(self, channel_id: int):
+        return bot.get_partial_messageable(channel_id, guild_id=self._guild.id)
+
+    def get_member(self, user_id: int):
+        return None
+
+async def jobs_main():
+    """Entry point for `python Main.py jobs`: REST login only, no gateway session."""
+    watchdog.start(asyncio.get_running_loop())
+    await init_db(force=True)
+    await bot.login(BOT_TOKEN)
+    try:
+        guild = RestGuild(await bot.fetch_guild(GUILD_ID))
+        print(f"✅ Job worker ready for {guild.name}: {JOB_WORKERS} consumer(s) on {DB_PATH}")
+        await asyncio.gather(
+            maintenance_loop(guild),
+            backup_loop(guild),
+            reminder_loop(),
+            *(run_jobs(guild, f"{os.getpid()}-{i}") for i in range(JOB_WORKERS)),
+        )
+    finally:
+        await bot.close()
 
 # ================== Daily Motivation ==================
 # Config: paste your messages here ↓↓↓
@@ -994,7 +3041,7 @@ async def _meta_set(db, key: str, value: str):
 
 async def _get_motiv_settings() -> tuple[int|None, int]:
     """Return (channel_id or None, hour_utc)"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         chan_s = await _meta_get(db, MOTIV_META_CHAN)
         hour_s = await _meta_get(db, MOTIV_META_HOUR, "9")  # default 09:00 UTC
     chan_id = int(chan_s) if chan_s else None
@@ -1005,7 +3052,7 @@ async def _get_motiv_settings() -> tuple[int|None, int]:
 async def _next_quote() -> str:
     if not QUOTES:
         return "Stay strong. One clean day at a time. 💪"
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         idx_s = await _meta_get(db, MOTIV_META_IDX, "0")
         idx = int(idx_s)
         quote = QUOTES[idx % len(QUOTES)]
@@ -1014,11 +3061,11 @@ async def _next_quote() -> str:
 
 async def _sleep_until(hour_utc: int):
     """Sleep until the next time it's <hour_utc>:00 (UTC)."""
-    now = dt.datetime.now(dt.timezone.utc)
+    now = now_utc()
     target = now.replace(hour=hour_utc, minute=0, second=0, microsecond=0)
     if target <= now:
         target += dt.timedelta(days=1)
-    await asyncio.sleep((target - now).total_seconds())
+    await clock.sleep((target - now).total_seconds())
 
 async def _post_motivation_once(guild: discord.Guild) -> bool:
     chan_id, _ = await _get_motiv_settings()
@@ -1037,9 +3084,10 @@ async def _post_motivation_once(guild: discord.Guild) -> bool:
         await post_log(guild, f"⚠️ Motivation post failed: {e}")
         return False
 
-async def motivation_loop():
-    await bot.wait_until_ready()
-    guild = bot.get_guild(GUILD_ID)
+async def motivation_loop(guild=None):
+    if guild is None:
+        await bot.wait_until_ready()
+        guild = bot.get_guild(GUILD_ID)
     if guild is None:
         return
     # initial delay to next scheduled hour
@@ -1057,14 +3105,14 @@ mot = app_commands.Group(name="motivation", description="Daily motivation contro
 @mot.command(name="setchannel", description="Bind the current channel for daily motivation posts")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def motivation_setchannel(inter: discord.Interaction):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         await _meta_set(db, MOTIV_META_CHAN, str(inter.channel_id))
     await inter.response.send_message(f"✅ Motivation channel set to <#{inter.channel_id}>.", ephemeral=True)
 
 @mot.command(name="sethour", description="Set the UTC hour (0–23) for daily posts")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def motivation_sethour(inter: discord.Interaction, hour_utc: app_commands.Range[int, 0, 23]):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with aiosqlite.connect(DB_PATH, timeout=DB_TIMEOUT) as db:
         await _meta_set(db, MOTIV_META_HOUR, str(hour_utc))
     await inter.response.send_message(f"✅ Daily motivation will post at **{hour_utc:02d}:00 UTC**.", ephemeral=True)
 
@@ -1103,8 +3151,10 @@ async def on_ready():
     print(f"✅ Logged in as {bot.user} ({bot.user.id})")
     await bot.wait_until_ready()
 
+    watchdog.start(asyncio.get_running_loop())
+
     # DB init
-    await init_db()
+    await init_db(force=True)
 
     guild = bot.get_guild(GUILD_ID)
     if guild is None:
@@ -1120,13 +3170,37 @@ async def on_ready():
     synced = await bot.tree.sync(guild=discord.Object(id=GUILD_ID))
     print(f"✅ Synced {len(synced)} slash command(s) to {guild.name} ({guild.id})")
 
+    global _warm_task
+    if _warm_task is None:
+        _warm_task = bot.loop.create_task(member_cache.warm(guild))
+
+    if BOT_MODE == "gateway":
+        return   # maintenance, backups and reminders run in the jobs process
+
     bot.loop.create_task(maintenance_loop())
 
+    global _backup_task, _reminder_task
+    if _reminder_task is None or _reminder_task.done():
+        _reminder_task = bot.loop.create_task(reminder_loop())
+    if _backup_task is None or _backup_task.done():
+        _backup_task = bot.loop.create_task(backup_loop())
+
 
 # Run
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["restore"]:
+        if len(sys.argv) != 3:
+            raise SystemExit("usage: python Main.py restore <backup.db>")
+        restore_db(sys.argv[2])
+        raise SystemExit(0)
     if not BOT_TOKEN:
         raise SystemExit("Set BOT_TOKEN env var.")
+    if sys.argv[1:2] == ["jobs"]:
+        BOT_MODE = "jobs"
+        asyncio.run(jobs_main())
+        raise SystemExit(0)
+    if sys.argv[1:2] == ["gateway"]:
+        BOT_MODE = "gateway"
     bot.run(BOT_TOKEN)
 
 # ======= End of Main.py =======
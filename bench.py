@@ -0,0 +1,375 @@
+"""Offline benchmarks against a synthetic database (no Discord connection needed).
+
+    python bench.py fts --rows 2000000
+    python bench.py time --rows 2000000
+    python bench.py members --members 200000
+    python bench.py proofs --rows 200000          # serves generated fixtures over a local HTTP server
+    python bench.py calendar --users 200 --years 2
+"""
+import argparse, asyncio, functools, gc, http.server, os, random, sqlite3, statistics, tempfile, threading, time
+import tracemalloc
+import aiosqlite
+import discord
+import Main
+
+THEME = ["craving", "urge", "relapse", "gym", "walk", "meditation", "journal", "sleep", "stress",
+         "friends", "family", "work", "tired", "proud", "trigger", "evening", "morning", "phone"]
+
+def _vocab(n=3000, seed=7):
+    rnd = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = {"".join(rnd.choice(letters) for _ in range(rnd.randint(3, 9))) for _ in range(n)}
+    return THEME + sorted(words)   # themed words are the most frequent
+
+def _fill_checkins(path: str, rows: int, users: int, seed=1, batch=50_000):
+    """Bulk insert synthetic check-ins (triggers fire, as in production)."""
+    rnd = random.Random(seed)
+    vocab = _vocab()
+    weights = [1.0 / (i + 1) for i in range(len(vocab))]   # Zipf-ish
+    start = Main.now_ts() - 3 * 365 * 86400
+    step = (3 * 365 * 86400) / rows
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA synchronous=OFF")
+    statuses = ["approved"] * 8 + ["rejected", "expired"]
+    done = 0
+    while done < rows:
+        n = min(batch, rows - done)
+        data = []
+        for i in range(done, done + n):
+            ts = start + int(i * step)
+            text = " ".join(rnd.choices(vocab, weights, k=30))
+            data.append((rnd.randint(1, users), ts, 1 + i % 1000, text, rnd.choice(statuses)))
+        con.executemany("""INSERT INTO checkins(user_id, created_at, day_reported, reflection, status)
+                           VALUES(?,?,?,?,?)""", data)
+        con.commit()
+        done += n
+    con.close()
+
+async def _timeit(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+async def bench_fts(args):
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    Main.DB_PATH = path
+    await Main.init_db()
+    if not Main.FTS_ENABLED:
+        raise SystemExit("SQLite here has no FTS5.")
+    t0 = time.perf_counter()
+    _fill_checkins(path, args.rows, args.users)
+    print(f"insert {args.rows:,} rows (with FTS triggers): {time.perf_counter() - t0:.1f}s")
+    print(f"db size: {os.path.getsize(path) / 1e6:.0f} MB")
+
+    async with aiosqlite.connect(path) as db:
+        cases = [
+            ("word",            dict(query="relapse")),
+            ("phrase",          dict(query='"craving gym"')),
+            ("prefix",          dict(query="medit*")),
+            ("word+user",       dict(query="trigger", user_id=42)),
+            ("word+status+date", dict(query="stress", status="expired",
+                                    since=Main._parse_day("2025-01-01"), until=Main._parse_day("2025-03-01"))),
+            ("deep page",       dict(query="walk", offset=500)),
+        ]
+        print(f"{'case':<18}{'fts ms':>10}{'LIKE scan ms':>14}")
+        for name, kw in cases:
+            fts = await _timeit(lambda: Main.search_reflections(db, **kw))
+            term = kw["query"].strip('"').rstrip("*")
+            like = await _timeit(lambda: db.execute_fetchall(
+                "SELECT COUNT(*) FROM checkins WHERE reflection LIKE ?", (f"%{term}%",)), repeat=1) \
+                if name in ("word", "phrase") else float("nan")
+            print(f"{name:<18}{fts:>10.1f}{like:>14.1f}")
+        t0 = time.perf_counter()
+        await db.execute("INSERT INTO checkins_fts(checkins_fts) VALUES('rebuild')")
+        await db.commit()
+        print(f"full rebuild: {time.perf_counter() - t0:.1f}s")
+
+LEGACY_TEXT_SQL = """
+CREATE TABLE users(user_id INTEGER PRIMARY KEY, current_streak INTEGER NOT NULL DEFAULT 0,
+  longest_streak INTEGER NOT NULL DEFAULT 0, last_checkin_at TEXT, frozen INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE checkins(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, message_id INTEGER,
+  channel_id INTEGER, created_at TEXT NOT NULL, day_reported INTEGER, reflection TEXT NOT NULL, proof_url TEXT,
+  status TEXT NOT NULL DEFAULT 'pending', validators TEXT DEFAULT '[]', similar_flag INTEGER NOT NULL DEFAULT 0, reason TEXT);
+CREATE TABLE meta(key TEXT PRIMARY KEY, value TEXT);
+"""
+
+async def bench_time(args):
+    """ISO TEXT timestamps (pre-migration) vs integer epoch columns + indexes."""
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench_time.db")
+    Main.DB_PATH = path
+    rnd = random.Random(3)
+    now = Main.now_utc()
+    con = sqlite3.connect(path)
+    con.executescript(LEGACY_TEXT_SQL)
+    span = 3 * 365 * 86400
+    iso = lambda secs_ago: (now - Main.dt.timedelta(seconds=secs_ago)).isoformat()
+    for lo in range(0, args.rows, 100_000):
+        con.executemany("INSERT INTO checkins(user_id, created_at, reflection, status) VALUES(?,?,?,?)",
+                        [(rnd.randint(1, args.users), iso(span * (1 - i / args.rows)), "x",
+                          "pending" if rnd.random() < 0.01 else "approved")
+                         for i in range(lo, min(args.rows, lo + 100_000))])
+    con.executemany("INSERT INTO users(user_id, current_streak, last_checkin_at) VALUES(?,?,?)",
+                    [(u, rnd.randint(0, 300), iso(rnd.uniform(0, 40 * 86400))) for u in range(1, args.users + 1)])
+    con.commit()
+    con.close()
+
+    cutoff_dt = now - Main.dt.timedelta(hours=24)
+    week_dt = now - Main.dt.timedelta(days=7)
+    lapsed_dt = now - Main.dt.timedelta(hours=Main.MAX_HOURS)
+    queries = [
+        ("expire pendings", "SELECT id, user_id FROM checkins WHERE status='pending' AND created_at<?", cutoff_dt),
+        ("last 7 days",     "SELECT COUNT(*) FROM checkins WHERE created_at>=?", week_dt),
+        ("lapsed users",    "SELECT COUNT(*) FROM users WHERE last_checkin_at<?", lapsed_dt),
+    ]
+
+    async def run_queries(to_param):
+        out = []
+        async with aiosqlite.connect(path) as db:
+            for name, sql, when in queries:
+                out.append(await _timeit(lambda: db.execute_fetchall(sql, (to_param(when),))))
+        return out
+
+    before = await run_queries(lambda d: d.isoformat())
+    t0 = time.perf_counter()
+    await Main.init_db()
+    migrate_s = time.perf_counter() - t0
+    after = await run_queries(lambda d: int(d.timestamp()))
+
+    print(f"rows: {args.rows:,} checkins, {args.users:,} users; migration took {migrate_s:.1f}s")
+    print(f"{'query':<18}{'ISO text ms':>13}{'epoch+index ms':>16}")
+    for (name, *_), b, a in zip(queries, before, after):
+        print(f"{name:<18}{b:>13.1f}{a:>16.2f}")
+
+    def hours_since_iso(ts_iso):
+        t = Main.dt.datetime.fromisoformat(ts_iso)
+        return (Main.now_utc() - t).total_seconds() / 3600.0
+    sample_iso, sample_ts = iso(3600), Main.now_ts() - 3600
+    n = 200_000
+    t0 = time.perf_counter(); [hours_since_iso(sample_iso) for _ in range(n)]; old = time.perf_counter() - t0
+    t0 = time.perf_counter(); [Main.hours_since(sample_ts) for _ in range(n)]; new = time.perf_counter() - t0
+    print(f"hours_since: ISO parse {old / n * 1e6:.2f}µs/call, integer {new / n * 1e6:.2f}µs/call")
+
+def _member_payload(uid: int, roles: list[int]) -> dict:
+    return {"user": {"id": str(uid), "username": f"member{uid}", "discriminator": "0", "avatar": None,
+                     "global_name": f"Member {uid}"},
+            "roles": [str(r) for r in roles], "joined_at": "2024-01-01T00:00:00+00:00",
+            "deaf": False, "mute": False, "flags": 0, "nick": None}
+
+def _synthetic_guild(members: int, holders: int, seed=5):
+    """A large guild as discord.py sees it: real Guild/Member objects, no network."""
+    rnd = random.Random(seed)
+    client = discord.Client(intents=Main.INTENTS)
+    state = client._connection
+    state.user = discord.ClientUser(state=state, data={"id": "1", "username": "bot", "discriminator": "0",
+                                                       "avatar": None, "bot": True})
+    role_ids = [Main.ROLE_VALIDATOR, Main.ROLE_SENIOR_VALID] + [rid for _, rid in Main.MILESTONES]
+    roles = [{"id": str(r), "name": f"role{r}", "position": i + 1, "permissions": "0", "color": 0,
+              "hoist": False, "managed": False, "mentionable": False} for i, r in enumerate(role_ids)]
+    guild = discord.Guild(data={"id": str(Main.GUILD_ID), "name": "bench", "roles": roles, "member_count": members,
+                                "emojis": [], "stickers": [], "features": []}, state=state)
+    holder_ids = set(rnd.sample(range(members), holders))
+    def stream():   # what a full chunk / fetch_members yields, page by page
+        for i in range(members):
+            yield discord.Member(data=_member_payload(10**17 + i, [rnd.choice(role_ids)] if i in holder_ids else []),
+                                 guild=guild, state=state)
+    return guild, stream
+
+def _measure(build) -> tuple[float, float, int]:
+    gc.collect()
+    tracemalloc.start()
+    guild = build()
+    gc.collect()
+    cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cur / 1e6, peak / 1e6, len(guild.members)
+
+async def bench_members(args):
+    """Resident member-cache memory: library default (chunk everyone) vs MemberCachePolicy."""
+    rnd = random.Random(9)
+    active = [10**17 + i for i in rnd.sample(range(args.members), args.active)]
+
+    def full():
+        guild, stream = _synthetic_guild(args.members, args.holders)
+        for m in stream():
+            guild._add_member(m)
+        return guild
+
+    def trimmed():
+        guild, stream = _synthetic_guild(args.members, args.holders)
+        policy = Main.MemberCachePolicy(recent_max=args.recent)
+        for m in stream():          # warm(): keep role holders only
+            if policy.pinned(m):
+                guild._add_member(m)
+        for uid in active:          # check-in authors / reactors arriving over the day
+            policy.touch(guild, discord.Member(data=_member_payload(uid, []), guild=guild, state=guild._state))
+        return guild
+
+    print(f"guild: {args.members:,} members, {args.holders:,} role holders, {args.active:,} active users")
+    print(f"{'cache':<10}{'cached':>10}{'MB held':>10}{'MB peak':>10}")
+    for name, build in (("full", full), ("trimmed", trimmed)):
+        mb, peak, n = _measure(build)
+        print(f"{name:<10}{n:>10,}{mb:>10.1f}{peak:>10.1f}")
+
+def _make_fixtures(root: str, seed=11):
+    """A photo-like image plus the ways people re-submit it."""
+    from PIL import Image, ImageDraw
+    rnd = random.Random(seed)
+    def picture():
+        img = Image.new("RGB", (800, 600), tuple(rnd.randrange(256) for _ in range(3)))
+        d = ImageDraw.Draw(img)
+        for _ in range(40):
+            x, y = rnd.randrange(800), rnd.randrange(600)
+            d.ellipse((x, y, x + rnd.randrange(40, 300), y + rnd.randrange(40, 300)),
+                      fill=tuple(rnd.randrange(256) for _ in range(3)))
+        return img
+    base = picture()
+    base.save(os.path.join(root, "base.png"))
+    base.save(os.path.join(root, "copy.png"))
+    base.resize((400, 300)).save(os.path.join(root, "small.png"))
+    base.convert("RGB").save(os.path.join(root, "recompressed.jpg"), quality=60)
+    picture().save(os.path.join(root, "other.png"))
+    with open(os.path.join(root, "note.txt"), "w") as f:
+        f.write("voice note transcript")
+
+async def bench_proofs(args):
+    """Proof reuse detection against a local file server, with `rows` unrelated proofs already indexed."""
+    root = args.dir or tempfile.mkdtemp()
+    _make_fixtures(root)
+    hits = []
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *a): pass
+        def do_GET(self):
+            hits.append(self.path)
+            super().do_GET()
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    Main.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_proofs.db")
+    Main.proof_cache = Main.ProofCache(root=tempfile.mkdtemp(), max_bytes=4 * 1024 * 1024)
+    Main.PROOF_FETCH_HOSTS.add("127.0.0.1")   # the fixture server stands in for the CDN
+    await Main.init_db()
+    rnd = random.Random(2)
+    async with aiosqlite.connect(Main.DB_PATH) as db:
+        for i in range(args.rows):
+            h = rnd.getrandbits(64)
+            await Main.record_proof(db, -i - 1, rnd.randint(1, 50_000), f"https://seed/{i}", rnd.randbytes(32), h)
+        await db.commit()
+
+        cases = [(1, "base.png"), (1, "base.png"), (2, "copy.png"), (1, "small.png"),
+                 (3, "recompressed.jpg"), (4, "other.png"), (5, "note.txt"), (6, "note.txt")]
+        print(f"{args.rows:,} unrelated proofs indexed; fixtures served from {root}")
+        print(f"{'user':<6}{'file':<18}{'flag':>6}{'lookup ms':>11}{'downloads':>11}")
+        for chk, (uid, name) in enumerate(cases, start=1):
+            url = f"{base_url}/{name}"
+            sha, phash = await Main.hash_proof(db, url)
+            t0 = time.perf_counter()
+            reuse = await Main.find_proof_reuse(db, uid, sha, phash)
+            ms = (time.perf_counter() - t0) * 1000
+            await Main.record_proof(db, chk, uid, Main.normalize_proof_url(url), sha, phash)
+            await db.commit()
+            flag = f"{reuse[0]}:#{reuse[2]}" if reuse else "-"
+            print(f"{uid:<6}{name:<18}{flag:>6}{ms:>11.2f}{len(hits):>11}")
+    # cache: a URL not yet in the proofs table is only downloaded once
+    url = f"{base_url}/other.png?v=2"
+    await asyncio.gather(*(Main.proof_cache.get(url) for _ in range(5)))
+    await Main.proof_cache.get(url)
+    print(f"cache: {dict(Main.proof_cache.stats)}; HTTP requests for {url.rsplit('/', 1)[1]}: "
+          f"{sum(1 for h in hits if h.endswith('?v=2'))}")
+    await Main.proof_cache.close()
+    server.shutdown()
+
+async def bench_calendar(args):
+    """Per-member calendar stats: row scan of approved check-ins vs the calendars bitset."""
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench_cal.db")
+    Main.DB_PATH = path
+    await Main.init_db()
+    rnd = random.Random(4)
+    today = Main.now_ts() // 86400 * 86400
+    span = args.years * 365
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA synchronous=OFF")
+    users = range(1_000_001, 1_000_001 + args.users)   # above the filler's user ids
+    for uid in users:
+        rows, day, habit = [], 0, rnd.uniform(0.6, 0.97)
+        while day < span:
+            if rnd.random() < habit:
+                ts = today - (span - day) * 86400 + rnd.randint(0, 86399)
+                rows.append((uid, ts, "x", "approved" if rnd.random() < 0.95 else "rejected"))
+            day += 1
+        con.executemany("INSERT INTO checkins(user_id, created_at, reflection, status) VALUES(?,?,?,?)", rows)
+    con.commit()
+    con.close()
+    _fill_checkins(path, args.filler, 50_000, seed=9)   # everybody else's history
+    async with aiosqlite.connect(path) as db:
+        t0 = time.perf_counter()
+        n = await Main.rebuild_calendars(db)
+        await db.commit()
+        seed_s = time.perf_counter() - t0
+        total = (await db.execute_fetchall("SELECT COUNT(*) FROM checkins"))[0][0]
+        size = (await db.execute_fetchall("SELECT AVG(LENGTH(bits)) FROM calendars WHERE user_id>=?", (users[0],)))[0][0]
+
+        today_i = Main.cal_day(Main.now_ts())
+        def stats_from_days(days: set[int]):
+            longest = run = 0
+            prev = None
+            for d in sorted(days):
+                run = run + 1 if prev == d - 1 else 1
+                longest = max(longest, run)
+                prev = d
+            last30 = sum(1 for d in days if d > today_i - 30)
+            return len(days), longest, last30
+
+        async def scan(uid):
+            cur = await db.execute("SELECT created_at FROM checkins WHERE user_id=? AND status='approved'", (uid,))
+            return stats_from_days({Main.cal_day(ts) for ts, in await cur.fetchall()})
+
+        async def bitset(uid):
+            bits = await Main.get_calendar(db, uid)
+            return Main.cal_count(bits), Main.cal_longest_run(bits), Main.cal_count(bits, today_i - 29, today_i)
+
+        for uid in list(users)[:20]:
+            assert await scan(uid) == await bitset(uid), uid
+        scan_ms = await _timeit(lambda: asyncio.gather(*(scan(u) for u in users)), repeat=3) / args.users
+        bit_ms = await _timeit(lambda: asyncio.gather(*(bitset(u) for u in users)), repeat=3) / args.users
+    print(f"{total:,} check-ins, {args.users} members with ~{args.years}y histories; "
+          f"seeded {n:,} calendars in {seed_s:.1f}s, avg {size:.0f} bytes each")
+    print(f"per member (days, longest run, last 30): row scan {scan_ms:.2f}ms, bitset {bit_ms:.3f}ms")
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("fts", help="reflection search vs LIKE scan")
+    p.add_argument("--rows", type=int, default=2_000_000)
+    p.add_argument("--users", type=int, default=20_000)
+    p.add_argument("--db", help="write the db here instead of a temp dir")
+    p.set_defaults(fn=bench_fts)
+    p = sub.add_parser("time", help="ISO text timestamps vs integer epoch + indexes (runs the migration)")
+    p.add_argument("--rows", type=int, default=2_000_000)
+    p.add_argument("--users", type=int, default=100_000)
+    p.add_argument("--db", help="write the db here instead of a temp dir")
+    p.set_defaults(fn=bench_time)
+    p = sub.add_parser("members", help="member cache memory: full chunk vs trimmed policy")
+    p.add_argument("--members", type=int, default=200_000)
+    p.add_argument("--holders", type=int, default=3_000, help="members with validator/milestone roles")
+    p.add_argument("--active", type=int, default=20_000, help="distinct members who check in or react")
+    p.add_argument("--recent", type=int, default=Main.MEMBER_RECENT_MAX)
+    p.set_defaults(fn=bench_members)
+    p = sub.add_parser("proofs", help="proof reuse detection against a local file server")
+    p.add_argument("--rows", type=int, default=200_000, help="unrelated proofs already indexed")
+    p.add_argument("--dir", help="fixture directory (default: generated in a temp dir)")
+    p.set_defaults(fn=bench_proofs)
+    p = sub.add_parser("calendar", help="calendar stats: row scan vs per-user bitset")
+    p.add_argument("--users", type=int, default=200, help="members with multi-year histories")
+    p.add_argument("--years", type=int, default=2, help="history length (calendars start at Main.CAL_EPOCH)")
+    p.add_argument("--filler", type=int, default=1_000_000, help="other check-ins in the table")
+    p.add_argument("--db", help="write the db here instead of a temp dir")
+    p.set_defaults(fn=bench_calendar)
+    args = ap.parse_args()
+    asyncio.run(args.fn(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Replay recorded gateway traffic against the real handlers, a stub Discord client
+and a local DB. Record with RECORD_EVENTS=/path/events.jsonl on the live bot.
+
+    python replay.py run events.jsonl --speed 1      # real time
+    python replay.py run events.jsonl --speed 20     # 20x
+    python replay.py run events.jsonl --speed max    # as fast as possible
+    python replay.py run events.jsonl --split 4      # gateway mode + 4 job-queue consumers
+    python replay.py synth events.jsonl --users 300  # 9pm-style burst, no live server needed
+"""
+import argparse, asyncio, collections, itertools, json, os, random, tempfile, time
+import types
+import Main
+
+_ids = itertools.count(10**17)
+CALLS: collections.Counter = collections.Counter()   # Discord REST calls made by handlers
+REST_DELAY = 0.0                                      # simulated REST round trip (s)
+
+async def _rest(name: str):
+    CALLS[name] += 1
+    if REST_DELAY:
+        await asyncio.sleep(REST_DELAY)
+
+# ---------- stub Discord objects (only what Main's handlers touch) ----------
+class StubRole:
+    def __init__(self, rid): self.id = rid
+    def __eq__(self, other): return getattr(other, "id", None) == self.id
+    def __hash__(self): return hash(self.id)
+
+class StubMember:
+    def __init__(self, uid, flags=()):
+        self.id = uid
+        self.bot = "bot" in flags
+        self.roles = []
+        if "validator" in flags: self.roles.append(StubRole(Main.ROLE_VALIDATOR))
+        if "senior" in flags: self.roles.append(StubRole(Main.ROLE_SENIOR_VALID))
+        self.display_name = f"user{uid % 100000}"
+        self.mention = f"<@{uid}>"
+    async def send(self, *a, **kw): await _rest("dm")
+    async def add_roles(self, *roles, reason=None):
+        await _rest("add_roles"); self.roles += [r for r in roles if r not in self.roles]
+    async def remove_roles(self, *roles, reason=None):
+        await _rest("remove_roles"); self.roles = [r for r in self.roles if r not in roles]
+
+class StubReaction:
+    def __init__(self, emoji): self.emoji, self.members = emoji, []
+    async def users(self):
+        CALLS["reaction_users"] += 1
+        for m in list(self.members):
+            yield m
+
+class StubMessage:
+    def __init__(self, channel, content=None, embed=None):
+        self.id, self.channel, self.content = next(_ids), channel, content
+        self.embeds = [embed] if embed else []
+        self.reactions: list[StubReaction] = []
+    def reaction(self, emoji):
+        for r in self.reactions:
+            if str(r.emoji) == emoji: return r
+        r = StubReaction(emoji); self.reactions.append(r); return r
+    async def add_reaction(self, emoji):
+        await _rest("add_reaction"); self.reaction(emoji).members.append(self.channel.guild.me)
+    async def edit(self, content=None, embed=None, **kw):
+        await _rest("edit_message")
+        if content is not None: self.content = content
+        if embed is not None: self.embeds = [embed]
+
+class StubChannel:
+    def __init__(self, guild, cid):
+        self.guild, self.id, self.messages, self.last_for = guild, cid, {}, {}
+    async def send(self, content=None, embed=None, **kw):
+        await _rest("send")
+        m = StubMessage(self, content, embed)
+        self.messages[m.id] = m
+        if content: self.last_for[content.split()[0]] = m
+        return m
+    async def fetch_message(self, mid):
+        await _rest("fetch_message")
+        if mid not in self.messages: raise LookupError(f"message {mid} not found")
+        return self.messages[mid]
+
+class StubGuild:
+    def __init__(self):
+        self.id, self.name = Main.GUILD_ID, "replay"
+        self._members: dict[int, StubMember] = {}
+        self.channels: dict[int, StubChannel] = {}
+        self.me = StubMember(1, ["bot"])
+    @property
+    def members(self): return list(self._members.values())
+    def member(self, uid, flags=()):
+        if uid not in self._members: self._members[uid] = StubMember(uid, flags)
+        return self._members[uid]
+    def get_member(self, uid): return self._members.get(uid)
+    async def fetch_member(self, uid): await _rest("fetch_member"); return self.member(uid)
+    def get_channel(self, cid):
+        if cid not in self.channels: self.channels[cid] = StubChannel(self, cid)
+        return self.channels[cid]
+    def get_role(self, rid): return StubRole(rid)
+
+class StubInteraction:
+    def __init__(self, guild, user):
+        self.guild, self.user, self.channel_id = guild, user, Main.CHANNEL_CHECKINS
+        self.modal = None
+        async def ack(*a, **kw): await _rest("interaction_response")
+        async def send_modal(modal): await _rest("interaction_response"); self.modal = modal
+        self.response = types.SimpleNamespace(defer=ack, send_message=ack, edit_message=ack, send_modal=send_modal)
+        self.followup = types.SimpleNamespace(send=ack)
+
+# ---------- replay ----------
+WORDS = "today was hard but I kept going cravings came after work so I went for a walk called a friend journaled and slept early".split()
+
+def _filler(n: int, rnd: random.Random) -> str:
+    out = []
+    while sum(len(w) + 1 for w in out) < n:
+        out.append(rnd.choice(WORDS))
+    return " ".join(out)[:max(n, 1)]
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))] if xs else float("nan")
+
+async def run(args):
+    global REST_DELAY
+    REST_DELAY = args.rest_ms / 1000
+    Main.RECORD_PATH = None
+    Main.PROOF_HASHING = False   # recorded proofs are placeholders, nothing to download
+    Main.DB_PATH = args.db or os.path.join(tempfile.mkdtemp(), "replay.db")
+    await Main.init_db()
+    guild = StubGuild()
+    Main.bot.get_guild = lambda gid: guild
+    checkins = guild.get_channel(Main.CHANNEL_CHECKINS)
+    stop, workers = asyncio.Event(), []
+    if args.split:
+        Main.BOT_MODE = "gateway"
+        workers = [asyncio.create_task(Main.run_jobs(guild, f"replay-{i}", stop)) for i in range(args.split)]
+
+    with open(args.events, encoding="utf-8") as f:
+        events = sorted((json.loads(l) for l in f if l.strip()), key=lambda e: e["t"])
+    if not events:
+        raise SystemExit("no events")
+
+    # link recorded card message ids to the submit that produced them
+    last_submit, msg_to_submit = {}, {}
+    for i, ev in enumerate(events):
+        if ev["kind"] == "checkin_submit":
+            last_submit[ev["user"]] = i
+        elif ev["kind"] == "checkin_posted" and ev["user"] in last_submit:
+            msg_to_submit[ev["message"]] = last_submit[ev["user"]]
+    flags = collections.defaultdict(set)
+    for ev in events:
+        if ev["kind"] == "reaction":
+            flags[ev["user"]].update(ev.get("flags", []))
+
+    rnd = random.Random(0)
+    submit_tasks: dict[int, asyncio.Task] = {}
+    lat = collections.defaultdict(list)
+    errors = collections.Counter()
+
+    async def dispatch(i, ev):
+        kind = ev["kind"]
+        member = guild.member(ev["user"], flags.get(ev["user"], ()))
+        t0 = time.perf_counter()
+        try:
+            if kind == "checkin_cmd":
+                await Main.checkin_cmd.callback(StubInteraction(guild, member))
+            elif kind == "checkin_submit":
+                modal = Main.CheckinModal(member)
+                modal.day._value = ev.get("day", "1")
+                modal.reflection._value = _filler(ev.get("reflection_len", 200), rnd)
+                modal.proof._value = "https://example.invalid/proof.png" if ev.get("proof") else ""
+                await modal.on_submit(StubInteraction(guild, member))
+                return checkins.last_for.get(member.mention)
+            elif kind == "reaction":
+                src = msg_to_submit.get(ev["message"])
+                card = await submit_tasks[src] if src in submit_tasks else None
+                chan_id = Main.CHANNEL_CHECKINS if ev.get("channel") == "checkins" else ev.get("channel") or 0
+                if card is not None and ev.get("emoji") == "✅":
+                    card.reaction("✅").members.append(member)
+                payload = types.SimpleNamespace(emoji=ev.get("emoji"), channel_id=chan_id, user_id=member.id,
+                                                message_id=card.id if card else next(_ids), member=member)
+                await Main.on_raw_reaction_add(payload)
+            else:
+                return None   # checkin_posted: bookkeeping only
+        except Exception as e:
+            errors[f"{kind}: {type(e).__name__}: {str(e)[:80]}"] += 1
+        finally:
+            if kind != "checkin_posted":
+                lat[kind].append((time.perf_counter() - t0) * 1000)
+
+    speed = None if args.speed == "max" else float(args.speed)
+    start, t_first = time.perf_counter(), events[0]["t"]
+    tasks = []
+    for i, ev in enumerate(events):
+        if speed:
+            delay = (ev["t"] - t_first) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        task = asyncio.create_task(dispatch(i, ev))
+        if ev["kind"] == "checkin_submit":
+            submit_tasks[i] = task
+        tasks.append(task)
+    await asyncio.gather(*tasks)
+    while Main._effect_tasks:   # let post-approval side effects finish
+        await asyncio.gather(*list(Main._effect_tasks))
+    gateway_wall = time.perf_counter() - start
+    if workers:
+        while await _jobs_left():
+            await asyncio.sleep(Main.JOB_POLL)
+        stop.set()
+        await asyncio.gather(*workers)
+    wall = time.perf_counter() - start
+
+    handled = sum(len(v) for v in lat.values())
+    print(f"events: {handled} in {wall:.2f}s → {handled / wall:.1f} ev/s (speed={args.speed}, rest={args.rest_ms}ms)")
+    print(f"{'kind':<16}{'n':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for kind, xs in sorted(lat.items()):
+        print(f"{kind:<16}{len(xs):>7}{_pct(xs, .5):>9.1f}{_pct(xs, .95):>9.1f}{_pct(xs, .99):>9.1f}{max(xs):>9.1f}")
+    if workers:
+        async with Main.aiosqlite.connect(Main.DB_PATH) as db:
+            jobs = dict(await db.execute_fetchall("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        print(f"gateway done after {gateway_wall:.2f}s; queue drained by {args.split} worker(s) at {wall:.2f}s; "
+              f"jobs: " + ", ".join(f"{k}={v}" for k, v in sorted(jobs.items())))
+    if Main.duplicate_events:
+        print("duplicates suppressed: " + ", ".join(f"{k}={v}" for k, v in sorted(Main.duplicate_events.items())))
+    print(f"errors: {sum(errors.values())}")
+    for msg, n in errors.most_common(10):
+        print(f"  {n:>5} × {msg}")
+    print("discord calls: " + ", ".join(f"{k}={v}" for k, v in CALLS.most_common()))
+    for line in Main.effect_summary():
+        print("effect " + line.lstrip("• ").replace("`", ""))
+
+async def _jobs_left() -> int:
+    async with Main.aiosqlite.connect(Main.DB_PATH) as db:
+        row = await db.execute_fetchall("SELECT COUNT(*) FROM jobs WHERE status IN ('queued','running')")
+    return row[0][0]
+
+def synth(args):
+    """Write a synthetic burst: every member checks in within `minutes`,
+    validators react to each card shortly after it is posted."""
+    rnd = random.Random(args.seed)
+    t0 = time.time()
+    users = list(range(1000, 1000 + args.users))
+    validators = list(range(500, 500 + args.validators))
+    out = []
+    for u in users:
+        t = t0 + rnd.uniform(0, args.minutes * 60)
+        out.append({"t": t, "kind": "checkin_cmd", "user": u})
+        t += rnd.uniform(20, 90)
+        out.append({"t": t, "kind": "checkin_submit", "user": u, "day": str(rnd.randint(1, 400)),
+                    "reflection_len": rnd.randint(150, 900), "proof": rnd.random() < 0.3})
+        mid = rnd.getrandbits(56)
+        out.append({"t": t + 0.5, "kind": "checkin_posted", "user": u, "message": mid})
+        for v in rnd.sample(validators, k=min(len(validators), rnd.randint(1, 3))):
+            out.append({"t": t + rnd.uniform(5, 300), "kind": "reaction", "user": v, "message": mid,
+                        "channel": "checkins", "emoji": "✅", "flags": ["validator"]})
+    out.sort(key=lambda e: e["t"])
+    with open(args.events, "w", encoding="utf-8") as f:
+        for ev in out:
+            f.write(json.dumps(ev) + "\n")
+    print(f"wrote {len(out)} events to {args.events}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("run", help="replay a recording")
+    p.add_argument("events")
+    p.add_argument("--speed", default="1", help="1, N (x faster) or max")
+    p.add_argument("--rest-ms", type=float, default=0.0, help="simulated Discord REST latency")
+    p.add_argument("--db", help="DB path (default: fresh temp DB)")
+    p.add_argument("--split", type=int, default=0, metavar="N",
+                   help="run in gateway mode with N in-process job consumers")
+    s = sub.add_parser("synth", help="generate a synthetic recording")
+    s.add_argument("events")
+    s.add_argument("--users", type=int, default=300)
+    s.add_argument("--validators", type=int, default=5)
+    s.add_argument("--minutes", type=float, default=15)
+    s.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    if args.cmd == "synth":
+        synth(args)
+    else:
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
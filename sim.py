@@ -0,0 +1,311 @@
+"""Simulate a community on a virtual clock: members check in, validators react and
+the background loops (maintenance, reminders, motivation, optionally backups) fire
+on schedule, against the stub Discord objects from replay.py and a local DB.
+A year of virtual time runs in minutes; use it to size the DB, see how handler
+latency drifts as tables grow and how many Discord calls a day costs.
+
+    python sim.py --members 200 --days 365
+    python sim.py --members 2000 --days 90 --validators 15 --csv days.csv
+    python sim.py --members 200 --days 30 --backups          # include the daily backup
+
+Handlers run one virtual instant at a time, so latencies show the cost of the DB
+as it grows, not contention under a burst (replay.py covers that).
+"""
+import argparse, asyncio, collections, csv, datetime as dt, heapq, itertools, math, os, random, re, tempfile, time
+import types
+import Main
+from replay import CALLS, StubGuild, StubInteraction, _filler, _ids, _pct
+
+SETTLE_STUCK = 120.0   # real seconds without progress before the run is declared stuck
+
+class VirtualClock(Main.Clock):
+    """Time only moves when every task is parked on this clock. `advance` then jumps
+    to the next timer and lets the tasks it woke run until they park again."""
+    def __init__(self, start: float):
+        self.now = start
+        self._timers: list = []                 # (t, seq, future)
+        self._parked: dict = {}                 # future -> (owner task, event waiter or None)
+        self._helpers: set = set()
+        self._seq = itertools.count()
+        self._kick = None
+
+    def time(self) -> float:
+        return self.now
+
+    def _park(self, seconds: float, waiter=None):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timers, (self.now + max(0.0, seconds), next(self._seq), fut))
+        self._parked[fut] = (asyncio.current_task(), waiter)
+        if self._kick and not self._kick.done():
+            self._kick.set_result(None)
+        return fut
+
+    async def sleep(self, seconds: float):
+        fut = self._park(seconds)
+        try:
+            await fut
+        finally:
+            self._parked.pop(fut, None)
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        if event.is_set():
+            return True
+        waiter = asyncio.ensure_future(event.wait())
+        self._helpers.add(waiter)
+        fut = self._park(timeout, waiter)
+        try:
+            await asyncio.wait({fut, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            self._helpers.discard(waiter)
+            self._parked.pop(fut, None)
+            if not fut.done():
+                fut.cancel()
+        return event.is_set()
+
+    async def _settle(self):
+        me, loop = asyncio.current_task(), asyncio.get_running_loop()
+        last, since = None, time.monotonic()
+        while True:
+            for _ in range(3):
+                await asyncio.sleep(0)
+            parked = {owner for fut, (owner, w) in self._parked.items()
+                      if not fut.done() and (w is None or not w.done())}
+            active = [t for t in asyncio.all_tasks()
+                      if t is not me and not t.done() and t not in parked and t not in self._helpers]
+            if not active:
+                return
+            if set(active) != last:
+                last, since = set(active), time.monotonic()
+            elif time.monotonic() - since > SETTLE_STUCK:
+                raise RuntimeError(f"simulation stuck on {len(active)} task(s): {active[:3]}")
+            self._kick = loop.create_future()
+            await asyncio.wait([*active, self._kick], timeout=0.05, return_when=asyncio.FIRST_COMPLETED)
+
+    async def advance(self, until: float):
+        """Fire every timer due up to `until` in order, then leave the clock at `until`."""
+        while True:
+            await self._settle()
+            while self._timers and self._timers[0][2].done():
+                heapq.heappop(self._timers)
+            if not self._timers or self._timers[0][0] > until:
+                self.now = max(self.now, until)
+                return
+            t, _, fut = heapq.heappop(self._timers)
+            self.now = max(self.now, t)
+            fut.set_result(None)
+
+# ---------- community model ----------
+class SimMember:
+    def __init__(self, uid: int, day: int, rnd: random.Random):
+        self.id, self.joined = uid, day
+        self.habit = rnd.betavariate(5, 2)                 # chance of checking in on a given day
+        self.hour = rnd.gauss(21, 2) % 24                  # preferred check-in hour (UTC)
+        self.proofs = rnd.random() < 0.3
+        self.reminders = rnd.random() < 0.2
+        self.day_no = 0                                    # the day number they report
+
+def plan_day(members, validators, day_start: float, rnd: random.Random, args):
+    """Events for one virtual day: (t, kind, member, extra)."""
+    out = []
+    for m in members:
+        if rnd.random() >= m.habit:
+            continue
+        t = day_start + ((m.hour + rnd.gauss(0, 1.5)) % 24) * 3600
+        ref_len = max(40, int(rnd.lognormvariate(math.log(320), 0.5)))
+        out.append((t, "checkin_cmd", m, None))
+        t_sub = t + rnd.uniform(20, 240)
+        out.append((t_sub, "checkin_submit", m, {"len": ref_len, "proof": m.proofs and rnd.random() < 0.7}))
+        if rnd.random() < args.ignored:
+            continue                                       # nobody looks at this one → expires
+        delay = t_sub
+        for i, v in enumerate(rnd.sample(validators, k=min(len(validators), rnd.choice((1, 1, 1, 2, 2, 3))))):
+            delay += rnd.expovariate(1 / (args.react_minutes * 60))
+            out.append((delay, "reaction", v, (m, i == 0)))
+    out.sort(key=lambda e: e[0])
+    return out
+
+async def run(args):
+    rnd = random.Random(args.seed)
+    # tmpfs by default: every connection close checkpoints the WAL with an fsync,
+    # which would dominate wall time; pass --db to measure on the real disk
+    tmp = tempfile.mkdtemp(dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    Main.RECORD_PATH = None
+    Main.PROOF_HASHING = False
+    Main.DB_PATH = args.db or os.path.join(tmp, "sim.db")
+    Main.BACKUP_DIR = os.path.join(tmp, "backups")
+    start = args.start or dt.datetime.now(dt.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    clock = Main.clock = VirtualClock(start.timestamp())
+    await Main.init_db()
+
+    guild = StubGuild()
+    Main.bot.get_guild = lambda gid: guild
+    Main.bot.get_user = lambda uid: guild.get_member(uid)
+    checkins = guild.get_channel(Main.CHANNEL_CHECKINS)
+    motiv = guild.get_channel(next(_ids))
+    async with Main.aiosqlite.connect(Main.DB_PATH) as db:
+        await Main._meta_set(db, Main.MOTIV_META_CHAN, str(motiv.id))
+
+    validators = [guild.member(500 + i, ["validator"]) for i in range(args.validators)]
+    validators += [guild.member(600 + i, ["validator", "senior"]) for i in range(args.seniors)]
+    uids = itertools.count(100_000)
+    members: list[SimMember] = []
+
+    async def join(day):
+        m = SimMember(next(uids), day, rnd)
+        guild.member(m.id)
+        members.append(m)
+        if m.reminders:
+            await Main.set_reminders(m.id, True)
+
+    for _ in range(args.members):
+        await join(0)
+
+    loops = [asyncio.create_task(Main.maintenance_loop(guild)),
+             asyncio.create_task(Main.reminder_loop()),
+             asyncio.create_task(Main.motivation_loop(guild))]
+    if args.backups:
+        loops.append(asyncio.create_task(Main.backup_loop(guild)))
+
+    lat = collections.defaultdict(list)
+    errors = collections.Counter()
+    cards: dict[int, asyncio.Task] = {}     # member id -> today's submit (returns the card)
+
+    async def handle(kind, member, extra):
+        sm = guild.member(member.id)
+        t0 = time.perf_counter()
+        try:
+            if kind == "checkin_cmd":
+                await Main.checkin_cmd.callback(StubInteraction(guild, sm))
+            elif kind == "checkin_submit":
+                modal = Main.CheckinModal(sm)
+                modal.day._value = str(member.day_no + 1)
+                modal.reflection._value = _filler(extra["len"], rnd)
+                modal.proof._value = f"https://example.invalid/{member.id}/{clock.now:.0f}.png" if extra["proof"] else ""
+                await modal.on_submit(StubInteraction(guild, sm))
+                card = checkins.last_for.pop(sm.mention, None)
+                if card is not None:
+                    member.day_no += 1
+                return card
+            else:
+                target, first = extra
+                src = cards.get(target.id)
+                card = await src if src else None
+                if card is None:
+                    return None
+                assigned = re.search(r"assigned to <@(\d+)>", card.content or "")
+                if first and assigned and rnd.random() < args.assignee_share:
+                    member = guild.get_member(int(assigned.group(1))) or member
+                card.reaction("✅").members.append(member)
+                payload = types.SimpleNamespace(emoji="✅", channel_id=Main.CHANNEL_CHECKINS, user_id=member.id,
+                                                message_id=card.id, member=member)
+                await Main.on_raw_reaction_add(payload)
+        except Exception as e:
+            errors[f"{kind}: {type(e).__name__}: {str(e)[:80]}"] += 1
+        finally:
+            lat[kind].append((time.perf_counter() - t0) * 1000)
+
+    async def drive(events):
+        for t, kind, who, extra in events:
+            if t > clock.time():
+                await clock.sleep(t - clock.time())
+            task = asyncio.create_task(handle(kind, who, extra))
+            if kind == "checkin_submit":
+                cards[who.id] = task
+
+    rows, wall0 = [], time.perf_counter()
+    size0 = _db_size()
+    calls_before = collections.Counter(CALLS)
+    print(f"{'day':>5}{'members':>9}{'submits':>9}{'approved':>9}{'sub p50':>9}{'sub p95':>9}"
+          f"{'rx p50':>8}{'rx p95':>8}{'calls':>8}{'db MB':>8}")
+    for day in range(args.days):
+        if day:
+            for _ in range(_poisson(rnd, len(members) * args.join_rate)):
+                await join(day)
+            members = [m for m in members if rnd.random() >= args.churn]
+        day_start = clock.time()
+        lat.clear()
+        async with Main.aiosqlite.connect(Main.DB_PATH) as db:
+            approved0 = (await Main.db_fetchone(db, "SELECT COUNT(*) FROM checkins WHERE status='approved'"))[0]
+        # late reactions spill into the next day; that driver keeps running alongside
+        loops.append(asyncio.create_task(drive(plan_day(members, validators, day_start, rnd, args))))
+        await clock.advance(day_start + 86400)
+        async with Main.aiosqlite.connect(Main.DB_PATH) as db:
+            approved = (await Main.db_fetchone(db, "SELECT COUNT(*) FROM checkins WHERE status='approved'"))[0] - approved0
+        calls = sum((CALLS - calls_before).values())
+        calls_before = collections.Counter(CALLS)
+        sub, rx = lat["checkin_submit"], lat["reaction"]
+        row = {"day": day + 1, "members": len(members), "submits": len(sub), "approved": approved,
+               "submit_p50_ms": _pct(sub, .5), "submit_p95_ms": _pct(sub, .95),
+               "reaction_p50_ms": _pct(rx, .5), "reaction_p95_ms": _pct(rx, .95),
+               "discord_calls": calls, "db_mb": _db_size() / 2**20}
+        rows.append(row)
+        if (day + 1) % args.report_every == 0 or day + 1 == args.days:
+            print(f"{row['day']:>5}{row['members']:>9}{row['submits']:>9}{row['approved']:>9}"
+                  f"{row['submit_p50_ms']:>9.1f}{row['submit_p95_ms']:>9.1f}{row['reaction_p50_ms']:>8.1f}"
+                  f"{row['reaction_p95_ms']:>8.1f}{row['discord_calls']:>8}{row['db_mb']:>8.2f}")
+
+    for t in loops:
+        t.cancel()
+    await asyncio.gather(*loops, return_exceptions=True)
+    wall = time.perf_counter() - wall0
+
+    async with Main.aiosqlite.connect(Main.DB_PATH) as db:
+        status = dict(await db.execute_fetchall("SELECT status, COUNT(*) FROM checkins GROUP BY status"))
+        tables = {name: (await Main.db_fetchone(db, f"SELECT COUNT(*) FROM {name}"))[0]
+                  for name in ("checkins", "users", "reminders", "calendars", "processed_events", "jobs")}
+    grown = (_db_size() - size0) / 2**20
+    print(f"\n{args.days} virtual day(s) in {wall:.1f}s real ({args.days * 86400 / wall:,.0f}x)")
+    where = "tmpfs, latencies exclude fsync" if Main.DB_PATH.startswith("/dev/shm") else Main.DB_PATH
+    print(f"db ({where}): {_db_size() / 2**20:.2f} MB (+{grown:.2f} MB, {grown / args.days * 365:.1f} MB/year at this rate)")
+    print("rows: " + ", ".join(f"{k}={v}" for k, v in tables.items()))
+    print("check-ins: " + ", ".join(f"{k}={v}" for k, v in sorted(status.items())))
+    print(f"discord calls: {sum(CALLS.values())} ({sum(CALLS.values()) / args.days:.0f}/day) — "
+          + ", ".join(f"{k}={v}" for k, v in CALLS.most_common()))
+    print("reminders: " + ", ".join(f"{k}={v}" for k, v in sorted(Main.reminder_stats.items())))
+    for line in await Main.validation_summary(args.days):
+        print(line.replace("**", ""))
+    print(f"errors: {sum(errors.values())}")
+    for msg, n in errors.most_common(10):
+        print(f"  {n:>5} × {msg}")
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=list(rows[0]))
+            w.writeheader()
+            w.writerows(rows)
+        print(f"per-day rows written to {args.csv}")
+
+def _db_size() -> int:
+    return sum(os.path.getsize(p) for p in (Main.DB_PATH, Main.DB_PATH + "-wal") if os.path.exists(p))
+
+def _poisson(rnd: random.Random, lam: float) -> int:
+    n, p, limit = 0, 1.0, math.exp(-lam)
+    while True:
+        p *= rnd.random()
+        if p <= limit:
+            return n
+        n += 1
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--members", type=int, default=200, help="members at day 0")
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--validators", type=int, default=5)
+    ap.add_argument("--seniors", type=int, default=1, help="senior validators (on top of --validators)")
+    ap.add_argument("--assignee-share", type=float, default=0.8,
+                    help="chance the first reaction on a card comes from its assigned validator")
+    ap.add_argument("--react-minutes", type=float, default=40, help="mean delay between validator reactions")
+    ap.add_argument("--ignored", type=float, default=0.05, help="share of cards no validator looks at")
+    ap.add_argument("--join-rate", type=float, default=0.004, help="new members per member per day")
+    ap.add_argument("--churn", type=float, default=0.003, help="chance a member leaves on a given day")
+    ap.add_argument("--start", type=lambda s: dt.datetime.fromisoformat(s).replace(tzinfo=dt.timezone.utc),
+                    help="virtual start date, YYYY-MM-DD (default: today)")
+    ap.add_argument("--backups", action="store_true", help="also run the daily backup loop")
+    ap.add_argument("--report-every", type=int, default=30, metavar="DAYS")
+    ap.add_argument("--csv", help="write one row per virtual day here")
+    ap.add_argument("--db", help="DB path (default: fresh temp DB)")
+    ap.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()